@@ -0,0 +1,73 @@
+import os
+import stat
+import anyio
+from typing import Optional
+from fastapi.responses import FileResponse
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import Receive, Scope, Send
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+# Snapshot filenames carry track id and capture time, so a file never changes once written
+SNAPSHOT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class ZeroCopyFileResponse(FileResponse):
+    """
+    FileResponse that hands the file descriptor to the ASGI server when it
+    advertises the zero-copy send extension, so the kernel sendfile()s the
+    file straight from the page cache to the socket.
+    Falls back to the regular chunked FileResponse on servers without it.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if ZEROCOPY_EXTENSION not in scope.get("extensions", {}) or self.send_header_only:
+            await super().__call__(scope, receive, send)
+            return
+
+        if self.stat_result is None:
+            try:
+                stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+                self.set_stat_headers(stat_result)
+            except FileNotFoundError:
+                raise RuntimeError(f"File at path {self.path} does not exist.")
+            else:
+                if not stat.S_ISREG(stat_result.st_mode):
+                    raise RuntimeError(f"File at path {self.path} is not a file.")
+
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            await send({"type": ZEROCOPY_EXTENSION, "file": fd, "more_body": False})
+        finally:
+            os.close(fd)
+
+        if self.background is not None:
+            await self.background()
+
+
+class ZeroCopyStaticFiles(StaticFiles):
+    """StaticFiles mount that serves files through ZeroCopyFileResponse"""
+    
+    def __init__(self, *args, cache_control: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope,
+                      status_code: int = 200) -> Response:
+        response = ZeroCopyFileResponse(
+            full_path, status_code=status_code, stat_result=stat_result, method=scope["method"]
+        )
+        if self.cache_control:
+            response.headers["Cache-Control"] = self.cache_control
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
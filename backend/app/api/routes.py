@@ -1,140 +1,182 @@
-from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import FileResponse, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.staticfiles import NotModifiedResponse
 from datetime import datetime, timedelta
 from typing import Optional, List
-from sqlmodel import select
-from app.models.database import TrafficEvent, get_session
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models.database import TrafficEvent, TrafficCount, AsyncSessionLocal, get_db
+from app.api.responses import ZeroCopyFileResponse, SNAPSHOT_CACHE_CONTROL
 from app.core.config import settings
 from app.services.location_service import location_service
+from app.utils.ttl_cache import ttl_cache
 import os
+import hashlib
 import logging
 import cv2
 import numpy as np
 import asyncio
+import aiohttp
+import orjson
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+MJPEG_BOUNDARY = "frame"
+
+# Columns served by the /events list (source_meta is only returned by /events/{id})
+EVENT_LIST_COLUMNS = (
+    TrafficEvent.id,
+    TrafficEvent.ts,
+    TrafficEvent.side,
+    TrafficEvent.lane,
+    TrafficEvent.direction,
+    TrafficEvent.vehicle_type,
+    TrafficEvent.color,
+    TrafficEvent.make_model,
+    TrafficEvent.make_model_conf,
+    TrafficEvent.snapshot_path,
+    TrafficEvent.plate_number,
+    TrafficEvent.plate_snapshot_path,
+    TrafficEvent.bbox,
+    TrafficEvent.track_id,
+)
+
+
+@ttl_cache(ttl=5)
+async def _last_hour_stats() -> dict:
+    """Counts events per side for the last hour (shared by all polling dashboards)"""
+    # Last 60 minute buckets, including the current one
+    first_bucket = datetime.utcnow().replace(second=0, microsecond=0) - timedelta(minutes=59)
+    
+    async with AsyncSessionLocal() as session:
+        # Sum the per-minute counters kept by the writer instead of scanning events
+        result = await session.exec(
+            select(TrafficCount.side, func.sum(TrafficCount.count)).where(
+                TrafficCount.side.in_(("left", "right")),
+                TrafficCount.bucket_start >= first_bucket
+            ).group_by(TrafficCount.side)
+        )
+        counts = dict(result.all())
+    
+    return {
+        "left": {"lastHourCount": counts.get("left", 0)},
+        "right": {"lastHourCount": counts.get("right", 0)}
+    }
+
 
 @router.get("/stats")
 async def get_stats():
     """Returns statistics for the last hour"""
-    one_hour_ago = datetime.utcnow() - timedelta(hours=1)
-    
-    with get_session() as session:
-        # Left side
-        left_count = session.exec(
-            select(TrafficEvent).where(
-                TrafficEvent.side == "left",
-                TrafficEvent.ts >= one_hour_ago
-            )
-        ).all()
-        
-        # Right side
-        right_count = session.exec(
-            select(TrafficEvent).where(
-                TrafficEvent.side == "right",
-                TrafficEvent.ts >= one_hour_ago
-            )
-        ).all()
-        
-        return {
-            "left": {"lastHourCount": len(left_count)},
-            "right": {"lastHourCount": len(right_count)}
-        }
+    return await _last_hour_stats()
 
 
 @router.get("/events")
 async def get_events(
     side: Optional[str] = Query(None, description="left or right"),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    session: AsyncSession = Depends(get_db)
 ):
     """Returns list of events"""
-    with get_session() as session:
-        query = select(TrafficEvent).order_by(TrafficEvent.ts.desc())
-        
-        if side:
-            if side not in ["left", "right"]:
-                raise HTTPException(status_code=400, detail="side must be 'left' or 'right'")
-            query = query.where(TrafficEvent.side == side)
-        
-        events = session.exec(query.limit(limit)).all()
-        
-        return [
-            {
-                "id": e.id,
-                "ts": e.ts.isoformat(),
-                "side": e.side,
-                "lane": e.lane,
-                "direction": e.direction,
-                "vehicle_type": e.vehicle_type,
-                "color": e.color,
-                "make_model": e.make_model or "Unknown",
-                "make_model_conf": e.make_model_conf,
-                "snapshot_path": e.snapshot_path,
-                "plate_number": e.plate_number or "XXXXX",
-                "plate_snapshot_path": e.plate_snapshot_path,
-                "bbox": e.bbox,
-                "track_id": e.track_id
-            }
-            for e in events
-        ]
+    query = select(*EVENT_LIST_COLUMNS).order_by(TrafficEvent.ts_epoch.desc(), TrafficEvent.id.desc())
+    
+    if side:
+        if side not in ["left", "right"]:
+            raise HTTPException(status_code=400, detail="side must be 'left' or 'right'")
+        query = query.where(TrafficEvent.side == side)
+    
+    # Plain rows: no ORM objects built just to be serialized
+    rows = (await session.exec(query.limit(limit))).all()
+    
+    return [
+        {
+            "id": r.id,
+            "ts": r.ts.isoformat(),
+            "side": r.side,
+            "lane": r.lane,
+            "direction": r.direction,
+            "vehicle_type": r.vehicle_type,
+            "color": r.color,
+            "make_model": r.make_model or "Unknown",
+            "make_model_conf": r.make_model_conf,
+            "snapshot_path": r.snapshot_path,
+            "plate_number": r.plate_number or "XXXXX",
+            "plate_snapshot_path": r.plate_snapshot_path,
+            "bbox": r.bbox,
+            "track_id": r.track_id
+        }
+        for r in rows
+    ]
 
 
 @router.get("/events/{event_id}")
-async def get_event(event_id: int):
+async def get_event(event_id: int, session: AsyncSession = Depends(get_db)):
     """Returns event details"""
-    with get_session() as session:
-        event = session.get(TrafficEvent, event_id)
-        if not event:
-            raise HTTPException(status_code=404, detail="Event not found")
-        
-        return {
-            "id": event.id,
-            "ts": event.ts.isoformat(),
-            "side": event.side,
-            "lane": event.lane,
-            "direction": event.direction,
-            "vehicle_type": event.vehicle_type,
-            "color": event.color,
-            "make_model": event.make_model or "Unknown",
-            "make_model_conf": event.make_model_conf,
-            "snapshot_path": event.snapshot_path,
-            "plate_number": event.plate_number or "XXXXX",
-            "plate_snapshot_path": event.plate_snapshot_path,
-            "bbox": event.bbox,
-            "track_id": event.track_id,
-            "source_meta": event.source_meta
-        }
+    event = await session.get(TrafficEvent, event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    return {
+        "id": event.id,
+        "ts": event.ts.isoformat(),
+        "side": event.side,
+        "lane": event.lane,
+        "direction": event.direction,
+        "vehicle_type": event.vehicle_type,
+        "color": event.color,
+        "make_model": event.make_model or "Unknown",
+        "make_model_conf": event.make_model_conf,
+        "snapshot_path": event.snapshot_path,
+        "plate_number": event.plate_number or "XXXXX",
+        "plate_snapshot_path": event.plate_snapshot_path,
+        "bbox": event.bbox,
+        "track_id": event.track_id,
+        "source_meta": event.source_meta
+    }
 
 
 @router.get("/snapshots/{filename}")
-async def get_snapshot(filename: str):
+async def get_snapshot(filename: str, request: Request):
     """Returns snapshot file"""
     filepath = os.path.join(settings.snapshots_dir, filename)
-    if not os.path.exists(filepath):
+    try:
+        stat_result = await run_in_threadpool(os.stat, filepath)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Snapshot not found")
-    return FileResponse(filepath)
+    
+    response = ZeroCopyFileResponse(filepath, stat_result=stat_result)
+    response.headers["Cache-Control"] = SNAPSHOT_CACHE_CONTROL
+    if request.headers.get("if-none-match") == response.headers["etag"]:
+        return NotModifiedResponse(response.headers)
+    return response
 
 
 @router.get("/stream-info")
-async def get_stream_info(force_refresh: bool = Query(False, description="Force refresh location from YouTube")):
+async def get_stream_info(
+    request: Request,
+    force_refresh: bool = Query(False, description="Force refresh location from YouTube")
+):
     """Returns stream location information"""
-    # If cache is empty, force refresh
-    if not location_service.location_cache:
-        force_refresh = True
+    # An empty cache is filled by get_location (from the disk cache or YouTube)
     location_info = location_service.get_location(force_refresh=force_refresh)
     logger.info(f"Stream info requested (force_refresh={force_refresh}), returning: {location_info}")
-    return location_info
+    
+    # Location rarely changes: let browsers cache it and revalidate with the ETag
+    body = orjson.dumps(location_info)
+    headers = {
+        "ETag": f'"{hashlib.md5(body).hexdigest()}"',
+        "Cache-Control": "public, max-age=300"
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
-@router.get("/weather")
-async def get_weather():
-    """Returns weather for stream location"""
-    location_info = location_service.get_location()
-    location = location_info.get('location', 'Unknown Location')
-    
+@ttl_cache(ttl=60)
+async def _weather_for(location: str) -> dict:
+    """Builds weather data for a location"""
     # In MVP we use mock data, later can connect real API (OpenWeatherMap etc.)
     # For real API, add API key to .env
     import random
@@ -151,15 +193,17 @@ async def get_weather():
     }
 
 
-@router.get("/news")
-async def get_news():
-    """Returns news for stream location"""
+@router.get("/weather")
+async def get_weather():
+    """Returns weather for stream location"""
     location_info = location_service.get_location()
     location = location_info.get('location', 'Unknown Location')
-    
-    # Extract city name (e.g., "Ocean City, MD, USA" -> "Ocean City")
-    city = location.split(',')[0].strip()
-    
+    return await _weather_for(location)
+
+
+@ttl_cache(ttl=300)
+async def _news_for_city(http: aiohttp.ClientSession, city: str) -> dict:
+    """Fetches news headlines for a city, falling back to mock data"""
     try:
         # Use Google News RSS to get news for the city
         import feedparser
@@ -169,8 +213,11 @@ async def get_news():
         query = urllib.parse.quote(f"{city} news")
         rss_url = f"https://news.google.com/rss/search?q={query}&hl=en-US&gl=US&ceid=US:en"
         
-        # Parse RSS
-        feed = feedparser.parse(rss_url)
+        # Fetch without blocking the event loop, then parse the downloaded bytes
+        async with http.get(rss_url) as response:
+            response.raise_for_status()
+            body = await response.read()
+        feed = feedparser.parse(body)
         
         news_items = []
         for entry in feed.entries[:10]:  # Take first 10 news items
@@ -208,87 +255,107 @@ async def get_news():
         }
 
 
+@router.get("/news")
+async def get_news(request: Request):
+    """Returns news for stream location"""
+    location_info = location_service.get_location()
+    location = location_info.get('location', 'Unknown Location')
+    
+    # Extract city name (e.g., "Ocean City, MD, USA" -> "Ocean City")
+    city = location.split(',')[0].strip()
+    return await _news_for_city(request.app.state.http, city)
+
+
+def _render_status_jpeg(text: str, color: tuple, hint: str = "Check backend logs for details") -> bytes:
+    """Renders a placeholder JPEG with a status line and a hint"""
+    status_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    cv2.putText(status_frame, text, (50, 220), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+    cv2.putText(status_frame, hint, (50, 260), 
+               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (128, 128, 128), 1)
+    ret, buffer = cv2.imencode('.jpg', status_frame)
+    return buffer.tobytes()
+
+
+# Placeholder frames never change, so they are rendered once at import
+STATUS_JPEGS = {
+    "connecting": _render_status_jpeg("Connecting to video stream...", (0, 255, 255)),  # Yellow
+    "loading": _render_status_jpeg("Loading YOLO model...", (0, 255, 255)),  # Yellow
+    "waiting": _render_status_jpeg("Waiting for video frame...", (0, 255, 0)),  # Green
+    "error": _render_status_jpeg("Error generating frame", (0, 0, 255)),  # Red
+}
+
+
+def _status_frame_jpeg() -> bytes:
+    """Returns the placeholder JPEG describing the current pipeline state"""
+    from app.main import ingest, detector
+    
+    if ingest is None or not ingest.is_opened():
+        return STATUS_JPEGS["connecting"]
+    if detector is None:
+        return STATUS_JPEGS["loading"]
+    return STATUS_JPEGS["waiting"]
+
+
 @router.get("/video-stream")
 async def video_stream():
     """
     Returns a single frame of processed video with detections (JPEG).
-    Frontend updates this endpoint every 100ms to create video effect.
+    Kept for one-off snapshots; the frontend streams /video-feed instead.
     """
-    from app.main import current_frame_with_detections
+    from app.main import current_jpeg_bytes
     
     try:
-        frame = current_frame_with_detections
-        if frame is not None:
-            # Check if frame is valid numpy array
-            if hasattr(frame, 'size') and frame.size > 0:
-                # Encode frame to JPEG
-                ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                if ret:
-                    frame_bytes = buffer.tobytes()
-                    return Response(content=frame_bytes, media_type="image/jpeg")
-                else:
-                    logger.warning("Failed to encode frame to JPEG")
-            else:
-                logger.warning(f"Frame has invalid size: {frame.size if hasattr(frame, 'size') else 'no size attr'}")
-        else:
-            logger.debug("No frame available yet (current_frame_with_detections is None)")
+        if current_jpeg_bytes:
+            return Response(content=current_jpeg_bytes, media_type="image/jpeg")
+        logger.debug("No frame available yet (current_jpeg_bytes is None)")
         
         # If no frame, send status frame with text
-        from app.main import ingest, detector, tracker
-        status_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-        
-        # Check status
-        if ingest is None or not ingest.is_opened():
-            status_text = "Connecting to video stream..."
-            color = (0, 255, 255)  # Yellow
-        elif detector is None:
-            status_text = "Loading YOLO model..."
-            color = (0, 255, 255)  # Yellow
-        else:
-            status_text = "Waiting for video frame..."
-            color = (0, 255, 0)  # Green
-        
-        cv2.putText(status_frame, status_text, (50, 220), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-        cv2.putText(status_frame, "Check backend logs for details", (50, 260), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (128, 128, 128), 1)
-        ret, buffer = cv2.imencode('.jpg', status_frame)
-        if ret:
-            frame_bytes = buffer.tobytes()
-            return Response(content=frame_bytes, media_type="image/jpeg")
+        return Response(content=_status_frame_jpeg(), media_type="image/jpeg")
     except Exception as e:
         logger.error(f"Error generating frame: {e}")
-        # Send error as image
-        error_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-        cv2.putText(error_frame, f"Error: {str(e)[:30]}", (50, 240), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-        ret, buffer = cv2.imencode('.jpg', error_frame)
-        if ret:
-            frame_bytes = buffer.tobytes()
-            return Response(content=frame_bytes, media_type="image/jpeg")
+        return Response(content=STATUS_JPEGS["error"], media_type="image/jpeg")
+
+
+async def _mjpeg_parts():
+    """Yields one multipart JPEG part per frame produced by the video loop"""
+    from app import main as pipeline
     
-    # Fallback
-    black_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-    ret, buffer = cv2.imencode('.jpg', black_frame)
-    return Response(content=buffer.tobytes(), media_type="image/jpeg")
+    while True:
+        jpeg = pipeline.current_jpeg_bytes or _status_frame_jpeg()
+        
+        yield (
+            b"--" + MJPEG_BOUNDARY.encode() + b"\r\n"
+            b"Content-Type: image/jpeg\r\n"
+            b"Content-Length: " + str(len(jpeg)).encode() + b"\r\n\r\n"
+            + jpeg + b"\r\n"
+        )
+        
+        # Wait for the next frame; time out so status frames keep refreshing
+        try:
+            await asyncio.wait_for(pipeline.frame_ready.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+
+
+@router.get("/video-feed")
+async def video_feed():
+    """
+    Streams processed video as MJPEG (multipart/x-mixed-replace).
+    One long-lived response pushes each new frame as the video loop produces it.
+    """
+    return StreamingResponse(
+        _mjpeg_parts(),
+        media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}"
+    )
 
 
 @router.get("/detections")
 async def get_current_detections():
     """
     Returns current detections for display in UI.
+    The body is serialized once per frame by the video loop.
     """
-    from app.main import current_detections
+    from app.main import current_detections_json
     
-    return {
-        "detections": [
-            {
-                "bbox": det.get("bbox", []),
-                "class": det.get("class", "unknown"),
-                "confidence": det.get("confidence", 0.0),
-                "track_id": det.get("track_id", None)
-            }
-            for det in current_detections
-        ],
-        "count": len(current_detections)
-    }
+    return Response(content=current_detections_json, media_type="application/json")
@@ -1,7 +1,8 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Set
-import json
+from typing import Awaitable, Callable, Optional, Set
+import asyncio
 import logging
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -19,19 +20,34 @@ class ConnectionManager:
         self.active_connections.discard(websocket)
         logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
     
-    async def broadcast(self, message: dict):
+    async def _safe_send(self, connection: WebSocket, send: Awaitable, timeout: float) -> Optional[WebSocket]:
+        """Awaits a send with a timeout; returns the connection if it failed"""
+        try:
+            await asyncio.wait_for(send, timeout=timeout)
+            return None
+        except Exception as e:
+            logger.error(f"Error sending WebSocket message: {e!r}")
+            return connection
+    
+    async def _fanout(self, make_send: Callable[[WebSocket], Awaitable], timeout: float):
+        """
+        Sends to all clients concurrently, so the slowest client bounds the
+        broadcast at `timeout` instead of delaying everyone else.
+        Clients whose send fails or times out are removed.
+        """
+        connections = list(self.active_connections)
+        results = await asyncio.gather(
+            *(self._safe_send(c, make_send(c), timeout) for c in connections)
+        )
+        for conn in results:
+            if conn is not None:
+                self.active_connections.discard(conn)
+    
+    async def broadcast(self, message: dict, timeout: float = 0.1):
         """Sends message to all connected clients"""
-        disconnected = set()
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"Error sending WebSocket message: {e}")
-                disconnected.add(connection)
-        
-        # Remove disconnected connections
-        for conn in disconnected:
-            self.active_connections.discard(conn)
+        # Serialize once for all clients; sent as text so browsers can JSON.parse it
+        text = orjson.dumps(message, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC).decode()
+        await self._fanout(lambda c: c.send_text(text), timeout)
 
 
 manager = ConnectionManager()
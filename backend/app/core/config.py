@@ -11,16 +11,21 @@ class Settings(BaseSettings):
     
     # Processing
     fps: int = 10
+    opencv_threads: int = 1  # cv2.setNumThreads for drawing/encoding (0 = OpenCV default of one per core)
+    decoder_threads: int = 2  # FFmpeg decoder threads per cv2.VideoCapture
+    hw_accel: str = "none"  # ffmpeg -hwaccel for stream sources: none (OpenCV decode), auto, cuda, vaapi, videotoolbox
     roi_config_path: str = "roi_config.json"
     
     # Storage
     database_url: str = "sqlite:///./traffic_events.db"
     snapshots_dir: str = "./static/snapshots"
+    serve_static: bool = True  # Set false when a reverse proxy serves /snapshots from snapshots_dir
     event_ttl_hours: int = 24
     
     # Model
     yolo_model: str = "yolov8n.pt"
     confidence_threshold: float = 0.25
+    yolo_tensorrt: bool = False  # Export yolo_model to a TensorRT FP16 engine and load that (needs a CUDA GPU)
     
     # Stream location (can be overridden via .env)
     stream_location: str = "New York, USA"
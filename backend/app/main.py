@@ -1,11 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import ORJSONResponse
 import asyncio
+import concurrent.futures
+import aiohttp
 import logging
+import cv2
+import orjson
 from app.api.routes import router
 from app.api.websocket import websocket_endpoint, manager
-from app.models.database import init_db
+from app.api.responses import ZeroCopyStaticFiles, SNAPSHOT_CACHE_CONTROL
+from app.models.database import init_db, async_engine
 from app.services.ingest import VideoIngest
 from app.services.detection import VehicleDetector
 from app.services.tracking import SimpleTracker
@@ -17,7 +22,7 @@ import os
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Traffic HUD API")
+app = FastAPI(title="Traffic HUD API", default_response_class=ORJSONResponse)
 
 # CORS
 app.add_middleware(
@@ -28,9 +33,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Static files for snapshots
+# Static files for snapshots (in Docker, nginx serves them straight from the shared volume)
 os.makedirs(settings.snapshots_dir, exist_ok=True)
-app.mount("/snapshots", StaticFiles(directory=settings.snapshots_dir), name="snapshots")
+if settings.serve_static:
+    app.mount(
+        "/snapshots",
+        ZeroCopyStaticFiles(directory=settings.snapshots_dir, cache_control=SNAPSHOT_CACHE_CONTROL),
+        name="snapshots"
+    )
 
 # Routes
 app.include_router(router, prefix="/api", tags=["api"])
@@ -46,12 +56,39 @@ tracker = None
 counter = None
 processing_task = None
 
+# Single worker so detect -> track -> draw -> count keep their per-frame order
+# while the event loop stays free for HTTP/WS handlers
+_det_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="video-worker")
+
 # Global buffer for the last processed frame with detections
 current_frame_with_detections = None
 current_detections = []
+# JPEG of the last processed frame, encoded once per frame and shared by all viewers
+current_jpeg_bytes = None
+# /detections response body, serialized once per frame
+current_detections_json = orjson.dumps({"detections": [], "count": 0})
+
+# Pulsed after each processed frame so MJPEG streams push it immediately
+frame_ready = asyncio.Event()
+
 
+def serialize_detections(tracked: list) -> bytes:
+    """Builds the /detections response body for the current frame"""
+    return orjson.dumps({
+        "detections": [
+            {
+                "bbox": det.get("bbox", []),
+                "class": det.get("class", "unknown"),
+                "confidence": det.get("confidence", 0.0),
+                "track_id": det.get("track_id", None)
+            }
+            for det in tracked
+        ],
+        "count": len(tracked)
+    })
 
-async def on_new_event(event: dict):
+
+async def on_new_event(event: dict, message_type: str = "event_created"):
     """Callback for new event - broadcasts via WebSocket"""
     try:
         # Convert datetime to string for JSON serialization
@@ -60,7 +97,7 @@ async def on_new_event(event: dict):
             event_copy['ts'] = event_copy['ts'].isoformat()
         
         await manager.broadcast({
-            "type": "event_created",
+            "type": message_type,
             "payload": event_copy
         })
         logger.info(f"Broadcasted event: track_id={event.get('track_id')}, side={event.get('side')}")
@@ -68,9 +105,29 @@ async def on_new_event(event: dict):
         logger.error(f"Error broadcasting event: {e}", exc_info=True)
 
 
+def render_frame(frame, tracked, track_histories, roi_config):
+    """Draws detections and counting lines, then encodes the frame to JPEG once"""
+    from app.utils.video_drawer import draw_detections, draw_counting_lines
+    # One copy to draw on: the captured frame is shared with snapshot/classification jobs
+    frame_with_detections = draw_detections(
+        frame.copy(), 
+        tracked, 
+        show_track_id=True, 
+        show_confidence=True,
+        track_histories=track_histories,
+        inplace=True
+    )
+    frame_with_detections = draw_counting_lines(frame_with_detections, roi_config, inplace=True)
+    
+    # Encode once here instead of once per viewer request
+    ret, buffer = cv2.imencode('.jpg', frame_with_detections, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return frame_with_detections, buffer.tobytes() if ret else None
+
+
 async def process_video_loop():
     """Main video processing loop"""
     global ingest, detector, tracker, counter
+    loop = asyncio.get_running_loop()
     
     while True:
         try:
@@ -78,13 +135,31 @@ async def process_video_loop():
                 logger.info("Initializing video ingest...")
                 try:
                     ingest = VideoIngest()
-                    ingest._open_stream()
+                    # Open the stream and load the model in parallel, off the event loop;
+                    # the model is kept across stream reconnects
+                    opening = loop.run_in_executor(None, ingest._open_stream)
+                    try:
+                        if detector is None:
+                            detector = await loop.run_in_executor(None, VehicleDetector)
+                            logger.info("YOLO model loaded")
+                    finally:
+                        await opening
                     if not ingest.is_opened():
                         raise ValueError("Video stream not opened")
-                    detector = VehicleDetector()
-                    logger.info("YOLO model loaded")
-                    tracker = SimpleTracker()
-                    counter = TrafficCounter()
+                    # Tracks don't carry over to a new connection; the counter (and its worker threads) does
+                    if tracker is None:
+                        tracker = SimpleTracker()
+                    else:
+                        tracker.reset()
+                    if counter is None:
+                        counter = TrafficCounter()
+                        # Events are saved and classified on worker threads; broadcast from the event loop
+                        counter.on_created = lambda event: asyncio.run_coroutine_threadsafe(
+                            on_new_event(event), loop
+                        )
+                        counter.on_update = lambda event: asyncio.run_coroutine_threadsafe(
+                            on_new_event(event, "event_updated"), loop
+                        )
                     logger.info("Video ingest initialized successfully")
                 except Exception as e:
                     logger.error(f"Error initializing video ingest: {e}", exc_info=False)
@@ -95,10 +170,11 @@ async def process_video_loop():
                     await asyncio.sleep(10)  # Longer wait before retry
                     continue
             
-            frame = ingest.read_frame()
+            # Waits up to 10 s on a stalled stream, so off the event loop
+            frame = await loop.run_in_executor(None, ingest.read_frame)
             if frame is None:
                 logger.warning("Failed to read frame, reinitializing...")
-                ingest.release()
+                await loop.run_in_executor(None, ingest.release)
                 ingest = None
                 await asyncio.sleep(2)
                 continue
@@ -109,7 +185,7 @@ async def process_video_loop():
                 await asyncio.sleep(1)
                 continue
                 
-            detections = detector.detect(frame)
+            detections = await loop.run_in_executor(_det_pool, detector.detect, frame)
             if detections:
                 logger.info(f"Detected {len(detections)} vehicles in frame")
             
@@ -119,40 +195,30 @@ async def process_video_loop():
                 await asyncio.sleep(1)
                 continue
                 
-            tracked = tracker.update(detections)
+            tracked = await loop.run_in_executor(_det_pool, tracker.update, detections)
             if tracked:
                 logger.info(f"Tracking {len(tracked)} vehicles")
             
             # Draw detections on frame for streaming
-            from app.utils.video_drawer import draw_detections, draw_counting_lines
             # Get track histories from tracker for visualization
-            track_histories = {}
-            if tracker and hasattr(tracker, 'tracks'):
-                for track_id, track in tracker.tracks.items():
-                    if "history" in track and len(track["history"]) > 0:
-                        track_histories[track_id] = track["history"]
+            track_histories = tracker.histories() if tracker else {}
             
-            frame_with_detections = draw_detections(
-                frame.copy(), 
-                tracked, 
-                show_track_id=True, 
-                show_confidence=True,
-                track_histories=track_histories
+            frame_with_detections, jpeg_bytes = await loop.run_in_executor(
+                _det_pool, render_frame, frame, tracked, track_histories, counter.roi_config
             )
-            frame_with_detections = draw_counting_lines(frame_with_detections, counter.roi_config)
             
-            # Save frame and detections for streaming
-            global current_frame_with_detections, current_detections
+            # Save frame and detections for streaming (plain rebinds, atomic for readers)
+            global current_frame_with_detections, current_detections, current_jpeg_bytes, current_detections_json
             current_frame_with_detections = frame_with_detections
+            current_jpeg_bytes = jpeg_bytes
             current_detections = tracked
+            current_detections_json = serialize_detections(tracked)
+            frame_ready.set()
+            frame_ready.clear()
             
             # Counting
-            # Create list of events for async processing
-            events = counter.process_frame(frame, tracked, on_event=None)
-            
-            # Send events via WebSocket asynchronously
-            for event in events:
-                await on_new_event(event)
+            # New events go to the counter's writer thread, which broadcasts them once saved
+            events = await loop.run_in_executor(_det_pool, counter.process_frame, frame, tracked)
             
             if events:
                 logger.info(f"Detected {len(events)} new events")
@@ -163,7 +229,7 @@ async def process_video_loop():
         except Exception as e:
             logger.error(f"Error in video processing loop: {e}", exc_info=True)
             if ingest:
-                ingest.release()
+                await loop.run_in_executor(None, ingest.release)
                 ingest = None
             await asyncio.sleep(5)
 
@@ -175,10 +241,15 @@ async def startup_event():
     init_db()
     logger.info("Database initialized")
     
-    # Clear location cache on startup to determine location from YouTube
+    # Shared HTTP client for outbound requests (news feed)
+    app.state.http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=3))
+    
+    # Clear location cache on startup to determine location from YouTube (or its disk cache)
     from app.services.location_service import location_service
     location_service.location_cache = None
     logger.info("Location cache cleared, will be determined from YouTube on first request")
+    # Start the YouTube lookup now so it has usually finished by the first request
+    location_service.get_location()
     
     # Start video processing in background
     global processing_task
@@ -194,10 +265,18 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     global ingest, processing_task
+    loop = asyncio.get_running_loop()
     if ingest:
-        ingest.release()
+        # Joins the reader thread (up to 5 s), so off the event loop
+        await loop.run_in_executor(None, ingest.release)
     if processing_task:
         processing_task.cancel()
+    # Let the frame in flight finish, so nothing reaches the counter after its final flush
+    await loop.run_in_executor(None, lambda: _det_pool.shutdown(wait=True, cancel_futures=True))
+    if counter:
+        await loop.run_in_executor(None, counter.close)
+    await app.state.http.close()
+    await async_engine.dispose()
     logger.info("Application shutdown")
 
 
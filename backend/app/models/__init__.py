@@ -1,4 +1,3 @@
-from .database import TrafficEvent, get_session, init_db
-
-__all__ = ["TrafficEvent", "get_session", "init_db"]
+from .database import TrafficEvent, TrafficCount, SessionManager, get_session, get_db, init_db
 
+__all__ = ["TrafficEvent", "TrafficCount", "SessionManager", "get_session", "get_db", "init_db"]
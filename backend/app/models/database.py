@@ -1,12 +1,21 @@
+import time
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index, event, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
 from sqlmodel import SQLModel, Field, Session, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
 
 
 class TrafficEvent(SQLModel, table=True):
+    # /events filters by side and orders by ts_epoch
+    __table_args__ = (Index("ix_side_ts_epoch", "side", "ts_epoch"),)
+    
     id: Optional[int] = Field(default=None, primary_key=True)
-    ts: datetime = Field(default_factory=datetime.utcnow)
+    ts: datetime = Field(default_factory=datetime.utcnow, index=True)
+    ts_epoch: int = Field(default_factory=lambda: int(time.time()), index=True)  # Unix seconds, for range filters and ordering
     side: str  # "left" or "right"
     lane: int  # 1, 2, or 3
     direction: str  # "toward_camera" or "away_from_camera"
@@ -22,13 +31,98 @@ class TrafficEvent(SQLModel, table=True):
     source_meta: Optional[str] = None  # JSON string for additional metadata
 
 
-engine = create_engine(settings.database_url, echo=False)
+class TrafficCount(SQLModel, table=True):
+    """Per-minute event count for a side, so /stats reads at most 60 rows per side"""
+    side: str = Field(primary_key=True)
+    bucket_start: datetime = Field(primary_key=True)
+    count: int = 0
+
+
+def _async_database_url(url: str) -> str:
+    """Maps the sync SQLite URL to the aiosqlite driver"""
+    if url.startswith("sqlite:///"):
+        return url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    return url
+
+
+# Sync engine for background writers (counting, cleanup)
+engine = create_engine(
+    settings.database_url,
+    echo=False,
+    pool_size=10,
+    max_overflow=20,
+    pool_recycle=3600,
+    pool_pre_ping=True,
+    # Pooled SQLite connections are shared between the loop and worker threads
+    connect_args={"check_same_thread": False} if settings.database_url.startswith("sqlite") else {},
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets API readers run alongside the writer; NORMAL skips the fsync per commit"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    # Read pages through a 256 MiB mmap and keep a 64 MiB page cache per connection
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+if settings.database_url.startswith("sqlite"):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+
+SessionLocal = sessionmaker(bind=engine, class_=Session, autoflush=False, expire_on_commit=False)
+
+# Async engine for API handlers so DB I/O doesn't block the event loop
+async_engine = create_async_engine(_async_database_url(settings.database_url), echo=False)
+if settings.database_url.startswith("sqlite"):
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
 
 def init_db():
     SQLModel.metadata.create_all(engine)
+    _add_ts_epoch_column()
+    # create_all skips existing tables, so add indexes missing from older databases
+    for index in TrafficEvent.__table__.indexes:
+        index.create(engine, checkfirst=True)
+
+
+def _add_ts_epoch_column():
+    """Adds and backfills ts_epoch on databases created before the column existed"""
+    columns = {column["name"] for column in inspect(engine).get_columns(TrafficEvent.__tablename__)}
+    if "ts_epoch" in columns:
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {TrafficEvent.__tablename__} ADD COLUMN ts_epoch INTEGER"))
+        if engine.dialect.name == "sqlite":
+            conn.execute(text(
+                f"UPDATE {TrafficEvent.__tablename__} SET ts_epoch = CAST(strftime('%s', ts) AS INTEGER)"
+            ))
+
+
+class SessionManager:
+    """Context manager for a pooled session: rolls back on error and always closes"""
+    
+    def __init__(self):
+        self.session = SessionLocal()
+    
+    def __enter__(self) -> Session:
+        return self.session
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.session.rollback()
+        self.session.close()
 
 
 def get_session():
-    return Session(engine)
+    return SessionManager()
+
 
+async def get_db():
+    """FastAPI dependency yielding an async session"""
+    async with AsyncSessionLocal() as session:
+        yield session
@@ -1,73 +1,134 @@
 import os
+import re
+import time
 import asyncio
 import logging
 from datetime import datetime, timedelta
+from typing import List, Tuple
 from app.core.config import settings
-from app.models.database import TrafficEvent, get_session
-from sqlmodel import select
+from app.models.database import TrafficEvent, TrafficCount, SessionManager
+from sqlmodel import select, delete
 
 logger = logging.getLogger(__name__)
 
+# snapshot_<track_id>_<unix time in ns>.jpg, as written by TrafficCounter._save_snapshot
+SNAPSHOT_STAMP_RE = re.compile(r"^snapshot_\d+_(\d+)\.jpg$")
+
+
+def _delete_expired_events(cutoff_epoch: int) -> Tuple[int, List[str]]:
+    """
+    Deletes events older than cutoff and expired /stats counter buckets.
+    Returns: (deleted event count, snapshot file paths of the deleted events)
+    """
+    with SessionManager() as session:
+        # Only the snapshot paths are needed to remove the files
+        expired = TrafficEvent.ts_epoch < cutoff_epoch
+        snapshot_paths = session.exec(
+            select(TrafficEvent.snapshot_path).where(expired, TrafficEvent.snapshot_path.is_not(None))
+        ).all()
+        
+        # Delete events with one statement instead of loading and deleting each row
+        deleted_count = session.execute(delete(TrafficEvent).where(expired)).rowcount
+        
+        # Drop counter buckets that fell out of the /stats hour
+        bucket_cutoff = datetime.utcnow().replace(second=0, microsecond=0) - timedelta(hours=1)
+        session.execute(delete(TrafficCount).where(TrafficCount.bucket_start < bucket_cutoff))
+        
+        session.commit()
+    
+    # Extract filename from path
+    return deleted_count, [
+        os.path.join(settings.snapshots_dir, path.split('/')[-1]) for path in snapshot_paths
+    ]
+
+
+def _sweep_orphaned_snapshots(cutoff_epoch: int) -> int:
+    """
+    Deletes snapshot files older than cutoff, whether or not an event still references them.
+    Runs as one batch in a worker thread; age comes from the capture time in the
+    filename, so only files with an unexpected name need a stat. Unlinks go through the
+    directory fd (unlinkat) so the kernel doesn't resolve the full path for every file.
+    Returns the number of files removed.
+    """
+    if not os.path.exists(settings.snapshots_dir):
+        return 0
+    
+    cutoff_ns = cutoff_epoch * 1_000_000_000
+    use_dir_fd = os.unlink in os.supports_dir_fd
+    dir_fd = os.open(settings.snapshots_dir, os.O_RDONLY) if use_dir_fd else None
+    removed = 0
+    try:
+        with os.scandir(settings.snapshots_dir) as entries:
+            for entry in entries:
+                if not (entry.name.startswith('snapshot_') and entry.name.endswith('.jpg')):
+                    continue
+                # d_type from the directory listing answers this without a stat
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    match = SNAPSHOT_STAMP_RE.match(entry.name)
+                    if match:
+                        expired = int(match.group(1)) < cutoff_ns
+                    else:
+                        # Get file modification time
+                        expired = entry.stat().st_mtime < cutoff_epoch
+                    if expired:
+                        os.unlink(entry.name if use_dir_fd else entry.path, dir_fd=dir_fd)
+                        removed += 1
+                        logger.debug(f"Deleted orphaned snapshot file: {entry.name}")
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logger.warning(f"Failed to delete snapshot file {entry.name}: {e}")
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+    return removed
+
+
+async def _remove_files(paths: List[str]) -> int:
+    """Unlinks files concurrently in the default thread pool, returns how many were removed"""
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        *(loop.run_in_executor(None, os.unlink, path) for path in paths),
+        return_exceptions=True
+    )
+    
+    removed = 0
+    for path, result in zip(paths, results):
+        if result is None:
+            removed += 1
+            logger.debug(f"Deleted snapshot file: {os.path.basename(path)}")
+        elif not isinstance(result, FileNotFoundError):
+            logger.warning(f"Failed to delete snapshot {os.path.basename(path)}: {result}")
+    return removed
+
 
 async def cleanup_old_events():
     """
     Cleans up old events and their snapshot files.
     Runs every minute to delete events older than 1 minute and their associated files.
     Also deletes all snapshot files older than 1 minute, even if events are already deleted.
+    Database and filesystem work runs in worker threads so the event loop isn't blocked.
     """
+    loop = asyncio.get_running_loop()
+    
     while True:
         try:
             # Calculate cutoff time (1 minute ago)
-            cutoff_time = datetime.utcnow() - timedelta(minutes=1)
-            
-            deleted_count = 0
-            deleted_files = 0
+            cutoff_epoch = int(time.time()) - 60
             
             # First, clean up events and their associated snapshots
-            with get_session() as session:
-                # Find events older than 1 minute
-                query = select(TrafficEvent).where(TrafficEvent.ts < cutoff_time)
-                old_events = session.exec(query).all()
-                
-                for event in old_events:
-                    # Delete snapshot file if it exists
-                    if event.snapshot_path:
-                        # Extract filename from path
-                        snapshot_filename = event.snapshot_path.split('/')[-1]
-                        snapshot_path = os.path.join(settings.snapshots_dir, snapshot_filename)
-                        
-                        if os.path.exists(snapshot_path):
-                            try:
-                                os.remove(snapshot_path)
-                                deleted_files += 1
-                                logger.debug(f"Deleted snapshot file: {snapshot_filename}")
-                            except Exception as e:
-                                logger.warning(f"Failed to delete snapshot {snapshot_filename}: {e}")
-                    
-                    # Delete event from database
-                    session.delete(event)
-                    deleted_count += 1
-                
-                if deleted_count > 0:
-                    session.commit()
-                    logger.info(f"Cleaned up {deleted_count} old events and {deleted_files} snapshot files")
+            deleted_count, snapshot_paths = await loop.run_in_executor(
+                None, _delete_expired_events, cutoff_epoch
+            )
+            deleted_files = await _remove_files(snapshot_paths)
+            if deleted_count > 0:
+                logger.info(f"Cleaned up {deleted_count} old events and {deleted_files} snapshot files")
             
             # Second, clean up any remaining snapshot files older than 1 minute
             # This catches files that might have been orphaned or not properly linked to events
-            if os.path.exists(settings.snapshots_dir):
-                cutoff_timestamp = cutoff_time.timestamp()
-                for filename in os.listdir(settings.snapshots_dir):
-                    if filename.startswith('snapshot_') and filename.endswith('.jpg'):
-                        filepath = os.path.join(settings.snapshots_dir, filename)
-                        try:
-                            # Get file modification time
-                            file_mtime = os.path.getmtime(filepath)
-                            if file_mtime < cutoff_timestamp:
-                                os.remove(filepath)
-                                deleted_files += 1
-                                logger.debug(f"Deleted orphaned snapshot file: {filename}")
-                        except Exception as e:
-                            logger.warning(f"Failed to delete snapshot file {filename}: {e}")
+            deleted_files += await loop.run_in_executor(None, _sweep_orphaned_snapshots, cutoff_epoch)
             
             if deleted_files > 0 or deleted_count > 0:
                 logger.info(f"Cleanup complete: {deleted_count} events, {deleted_files} snapshot files deleted")
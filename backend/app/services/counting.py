@@ -1,12 +1,18 @@
 import json
 import os
+import queue
+import threading
+import time
 import cv2
 import numpy as np
 from typing import Dict, List, Optional, Tuple, Callable
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import logging
 from app.core.config import settings
-from app.models.database import TrafficEvent, get_session
+from app.models.database import TrafficEvent, TrafficCount, SessionManager
 # from app.utils.plate_blur import blur_plate_region  # Disabled - no blurring on snapshots
 from app.utils.color_classifier import classify_color
 from app.utils.make_model_classifier import classify_make_model
@@ -14,24 +20,79 @@ from app.utils.plate_recognizer import extract_plate_region, recognize_plate_num
 
 logger = logging.getLogger(__name__)
 
+MAX_TRACKS = 4096  # Track states/classifications kept; more than the tracks alive at any one time
+EVENT_BATCH_MAX = 64  # Events committed per transaction by the writer thread
+
+# Parsed ROI config per (path, mtime), with the zone lookup tables rasterized from it per frame size.
+# Shared by TrafficCounter instances, so building another one skips re-reading and re-rasterizing.
+_roi_cache: Dict[Tuple[str, float], Tuple[Dict, Dict[Tuple[int, int], Tuple[np.ndarray, Dict[str, np.ndarray]]]]] = {}
+
+
+def _as_contour(polygon: List[List[int]]) -> np.ndarray:
+    """Converts a [[x, y], ...] polygon to an OpenCV contour"""
+    return np.asarray(polygon, dtype=np.int32).reshape(-1, 1, 2)
+
+
+def _write_jpeg(filepath: str, image: np.ndarray, what: str):
+    """Encodes image to JPEG and writes it to filepath (runs on the snapshot I/O pool)"""
+    try:
+        # Same quality as the video stream; the default 95 costs noticeably more encode time
+        ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if not ok:
+            logger.warning(f"Failed to encode {what}")
+            return
+        with open(filepath, 'wb') as f:
+            f.write(buffer)
+        logger.debug(f"Saved {what}: {filepath}")
+    except Exception as e:
+        logger.warning(f"Failed to save {what}: {e}")
+
+
+@dataclass
+class TrackState:
+    """Counting state of one track"""
+    counted_side: Optional[str] = None  # side where it was counted ("left" or "right")
+    max_area: Optional[float] = None  # maximum bbox area (for finding closest point)
+    snapshot_taken: bool = False  # whether snapshot was already taken
+
 
 class TrafficCounter:
     def __init__(self):
         self.roi_config = self._load_roi_config()
-        self.counted_tracks: Dict[int, str] = {}  # track_id -> side where it was counted ("left" or "right")
-        self.track_history: Dict[int, List[Tuple[float, float]]] = {}  # track_id -> list of (x, y) centroids
-        self.track_max_area: Dict[int, float] = {}  # track_id -> maximum bbox area (for finding closest point)
-        self.snapshot_taken: Dict[int, bool] = {}  # track_id -> whether snapshot was already taken
+        # track_id -> TrackState, least recently seen first; capped at MAX_TRACKS
+        self.track_states: OrderedDict[int, TrackState] = OrderedDict()
+        self._compile_polygons()
+        self._lut_shape: Optional[Tuple[int, int]] = None  # (height, width) the zone lookup tables were built for
+        # Snapshot JPEG encoding and disk writes, kept off the frame processing thread
+        os.makedirs(settings.snapshots_dir, exist_ok=True)
+        self._io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="snapshot-io")
+        # Color/make-model/plate recognition for saved events, also off the frame processing thread
+        self._classify_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="classify")
+        self.on_update: Optional[Callable[[Dict], None]] = None  # called with the full event once classified
+        # track_id -> color/make-model found for its first event, reused when it's counted again on the other side
+        self._classifications: OrderedDict[int, Dict] = OrderedDict()
+        self._classifications_lock = threading.Lock()
+        # Events are saved by one writer thread, which commits whatever has queued up as one transaction
+        self.event_q: "queue.Queue[Optional[Tuple[Dict, np.ndarray, Tuple[int, int, int, int], Optional[int]]]]" = queue.Queue()
+        self.on_created: Optional[Callable[[Dict], None]] = None  # called with each event once it has an id
+        self._writer = threading.Thread(target=self._event_writer, name="event-writer", daemon=True)
+        self._writer.start()
         
     def _load_roi_config(self) -> Dict:
-        """Loads ROI configuration from JSON"""
+        """Loads ROI configuration from JSON (cached until the file changes)"""
         config_path = settings.roi_config_path
         if not os.path.exists(config_path):
             logger.warning(f"ROI config not found: {config_path}, using defaults")
+            self._zone_luts = {}
             return self._default_config()
         
-        with open(config_path, 'r') as f:
-            return json.load(f)
+        key = (config_path, os.path.getmtime(config_path))
+        if key not in _roi_cache:
+            with open(config_path, 'r') as f:
+                _roi_cache.clear()
+                _roi_cache[key] = (json.load(f), {})
+        config, self._zone_luts = _roi_cache[key]
+        return config
     
     def _default_config(self) -> Dict:
         """Returns default configuration"""
@@ -60,125 +121,127 @@ class TrafficCounter:
             }
         }
     
-    def _point_in_polygon(self, point: Tuple[float, float], polygon: List[List[int]]) -> bool:
-        """Checks if point is inside polygon"""
-        x, y = point
-        n = len(polygon)
-        inside = False
-        
-        p1x, p1y = polygon[0]
-        for i in range(1, n + 1):
-            p2x, p2y = polygon[i % n]
-            if y > min(p1y, p2y):
-                if y <= max(p1y, p2y):
-                    if x <= max(p1x, p2x):
-                        if p1y != p2y:
-                            xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                        if p1x == p2x or x <= xinters:
-                            inside = not inside
-            p1x, p1y = p2x, p2y
-        
-        return inside
+    def _compile_polygons(self):
+        """Converts ROI and lane polygons once to the contour arrays cv2.pointPolygonTest expects"""
+        self._roi_polygons: Dict[str, np.ndarray] = {}
+        self._lane_polygons: Dict[str, List[Tuple[int, np.ndarray]]] = {}
+        self._side_directions: Dict[str, str] = {}  # side -> direction stored on its events
+        for side in ("left", "right"):
+            side_config = self.roi_config[f"{side}_side"]
+            self._side_directions[side] = side_config["direction"]
+            self._roi_polygons[side] = _as_contour(side_config["roi"]["polygon"])
+            self._lane_polygons[side] = [
+                (lane["id"], _as_contour(lane["polygon"])) for lane in side_config["lanes"]
+            ]
     
-    def _line_intersection(self, line1: Tuple[Tuple[float, float], Tuple[float, float]], 
-                          line2: Tuple[Tuple[float, float], Tuple[float, float]]) -> Optional[Tuple[float, float]]:
-        """Checks intersection of two line segments"""
-        (x1, y1), (x2, y2) = line1
-        (x3, y3), (x4, y4) = line2
-        
-        denom = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
-        if denom == 0:
+    def _build_zone_lut(self, height: int, width: int):
+        """
+        Rasterizes ROIs and lanes once per frame size into per-pixel lookup tables:
+        _roi_lut holds bit 1 for the left ROI and bit 2 for the right ROI,
+        _lane_lut[side] holds the lane id at each pixel (0 = no lane).
+        """
+        luts = self._zone_luts.get((height, width))
+        if luts is None:
+            roi_lut = np.zeros((height, width), dtype=np.uint8)
+            lane_luts: Dict[str, np.ndarray] = {}
+            for bit, side in ((1, "left"), (2, "right")):
+                roi_mask = np.zeros((height, width), dtype=np.uint8)
+                cv2.fillPoly(roi_mask, [self._roi_polygons[side]], bit)
+                roi_lut |= roi_mask
+                
+                lane_lut = np.zeros((height, width), dtype=np.uint8)
+                # Paint in reverse so the first matching lane wins, as in the linear scan
+                for lane_id, polygon in reversed(self._lane_polygons[side]):
+                    cv2.fillPoly(lane_lut, [polygon], lane_id)
+                lane_luts[side] = lane_lut
+            luts = self._zone_luts[(height, width)] = (roi_lut, lane_luts)
+        self._roi_lut, self._lane_lut = luts
+        self._lut_shape = (height, width)
+    
+    def _lut_index(self, point: Tuple[float, float]) -> Optional[Tuple[int, int]]:
+        """Returns the (row, col) of point in the lookup tables, or None if it's off the frame"""
+        col, row = int(point[0]), int(point[1])
+        if self._lut_shape is None or not (0 <= row < self._lut_shape[0] and 0 <= col < self._lut_shape[1]):
             return None
+        return row, col
+    
+    def _roi_codes(self, centroids: np.ndarray) -> np.ndarray:
+        """Returns the ROI code of each (x, y) centroid: bit 1 = in left ROI, bit 2 = in right ROI"""
+        cols = centroids[:, 0].astype(np.int64)
+        rows = centroids[:, 1].astype(np.int64)
+        height, width = self._lut_shape
+        on_frame = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+        codes = np.zeros(len(centroids), dtype=np.uint8)
+        codes[on_frame] = self._roi_lut[rows[on_frame], cols[on_frame]]
         
-        t = ((x1 - x3) * (y3 - y4) - (y1 - y3) * (x3 - x4)) / denom
-        u = -((x1 - x2) * (y1 - y3) - (y1 - y2) * (x1 - x3)) / denom
-        
-        if 0 <= t <= 1 and 0 <= u <= 1:
-            x = x1 + t * (x2 - x1)
-            y = y1 + t * (y2 - y1)
-            return (x, y)
-        return None
+        # Centroids off the frame fall back to the polygon test
+        for i in np.flatnonzero(~on_frame):
+            point = tuple(centroids[i])
+            codes[i] = (self._point_in_polygon(point, self._roi_polygons["left"])
+                        | self._point_in_polygon(point, self._roi_polygons["right"]) << 1)
+        return codes
+    
+    def _point_in_polygon(self, point: Tuple[float, float], polygon: np.ndarray) -> bool:
+        """Checks if point is inside polygon (edges count as inside)"""
+        return cv2.pointPolygonTest(polygon, (float(point[0]), float(point[1])), False) >= 0
     
     def _get_lane(self, centroid: Tuple[float, float], side: str) -> int:
         """Determines lane by centroid"""
-        side_config = self.roi_config[f"{side}_side"]
-        for lane in side_config["lanes"]:
-            if self._point_in_polygon(centroid, lane["polygon"]):
-                return lane["id"]
+        index = self._lut_index(centroid)
+        if index is not None:
+            return int(self._lane_lut[side][index]) or 1  # Default
+        
+        for lane_id, polygon in self._lane_polygons[side]:
+            if self._point_in_polygon(centroid, polygon):
+                return lane_id
         return 1  # Default
     
-    def _crossed_counting_line(self, track_id: int, side: str) -> bool:
-        """Checks if track crossed counting line"""
-        if track_id not in self.track_history or len(self.track_history[track_id]) < 2:
-            return False
-        
-        side_config = self.roi_config[f"{side}_side"]
-        line_start = side_config["counting_line"]["start"]
-        line_end = side_config["counting_line"]["end"]
-        direction = side_config["counting_line"]["direction"]
-        
-        history = self.track_history[track_id]
-        
-        # Check intersection between consecutive points
-        for i in range(len(history) - 1):
-            p1 = history[i]
-            p2 = history[i + 1]
-            
-            intersection = self._line_intersection(
-                (p1, p2),
-                ((line_start[0], line_start[1]), (line_end[0], line_end[1]))
-            )
-            
-            if intersection:
-                # Check direction
-                dy = p2[1] - p1[1]
-                if direction == "toward_camera":
-                    # Movement toward camera: y should decrease (moving up)
-                    if dy < 0:
-                        logger.debug(f"Track {track_id} crossed {side} counting line (toward_camera, dy={dy:.1f})")
-                        return True
-                else:  # away_from_camera
-                    # Movement away from camera: y should increase (moving down)
-                    if dy > 0:
-                        logger.debug(f"Track {track_id} crossed {side} counting line (away_from_camera, dy={dy:.1f})")
-                        return True
-        
-        return False
+    def _track_state(self, track_id: int) -> TrackState:
+        """Returns the track's state, creating it and evicting the least recently seen track if full"""
+        state = self.track_states.get(track_id)
+        if state is None:
+            state = self.track_states[track_id] = TrackState()
+            if len(self.track_states) > MAX_TRACKS:
+                self.track_states.popitem(last=False)
+        else:
+            self.track_states.move_to_end(track_id)
+        return state
     
-    def process_frame(self, frame: np.ndarray, detections: List[Dict], 
-                     on_event: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+    def process_frame(self, frame: np.ndarray, detections: List[Dict]) -> List[Dict]:
         """
         Processes frame with detections and creates passage events.
-        on_event: callback(event_dict) called on new event
+        Events are returned before they are saved; on_created fires once each one has an id.
         """
         events = []
         
-        for det in detections:
+        # One clock read per frame for event timestamps and snapshot filenames
+        now_ns = time.time_ns()
+        ts = datetime.utcfromtimestamp(now_ns / 1_000_000_000)
+        ts_epoch = now_ns // 1_000_000_000
+        
+        # ROI/lane lookup tables are rebuilt only when the frame size changes
+        if frame.shape[:2] != self._lut_shape:
+            self._build_zone_lut(*frame.shape[:2])
+        
+        # Centroids and ROI membership for all detections at once
+        boxes = np.array([det["bbox"] for det in detections], dtype=np.float64).reshape(-1, 4)
+        centroids = (boxes[:, :2] + boxes[:, 2:]) / 2
+        roi_codes = self._roi_codes(centroids).tolist()
+        
+        # Determine side based on ROI membership (more reliable than X position),
+        # with X position against the frame middle as tiebreaker/fallback
+        frame_width = frame.shape[1] if len(frame.shape) > 1 else 1920
+        half_width = frame_width / 2
+        
+        for det, centroid, roi_code in zip(detections, centroids.tolist(), roi_codes):
             track_id = det["track_id"]
-            bbox = det["bbox"]
+            # One immutable tuple shared by snapshot, classifiers and the stored event
+            bbox = tuple(det["bbox"])
             vehicle_type = det["class"]
-            
-            # Calculate centroid
             x1, y1, x2, y2 = bbox
-            centroid = ((x1 + x2) / 2, (y1 + y2) / 2)
-            
-            # Update track history
-            if track_id not in self.track_history:
-                self.track_history[track_id] = []
-            self.track_history[track_id].append(centroid)
-            # Limit history
-            if len(self.track_history[track_id]) > 10:
-                self.track_history[track_id] = self.track_history[track_id][-10:]
-            
-            # Determine side based on ROI membership (more reliable than X position)
-            frame_width = frame.shape[1] if len(frame.shape) > 1 else 1920
             
             # Check which ROI the centroid is in
-            left_roi_polygon = self.roi_config["left_side"]["roi"]["polygon"]
-            right_roi_polygon = self.roi_config["right_side"]["roi"]["polygon"]
-            
-            in_left_roi = self._point_in_polygon(centroid, left_roi_polygon)
-            in_right_roi = self._point_in_polygon(centroid, right_roi_polygon)
+            in_left_roi, in_right_roi = bool(roi_code & 1), bool(roi_code & 2)
             
             # Determine side based on ROI membership
             if in_left_roi and not in_right_roi:
@@ -187,130 +250,127 @@ class TrafficCounter:
                 side = "right"
             elif in_left_roi and in_right_roi:
                 # If in both ROIs (overlap), use X position as tiebreaker
-                side = "left" if centroid[0] < frame_width / 2 else "right"
+                side = "left" if centroid[0] < half_width else "right"
                 logger.debug(f"Track {track_id}: In both ROIs, using X position: {side}")
             else:
                 # If not in any ROI, use X position as fallback
-                side = "left" if centroid[0] < frame_width / 2 else "right"
+                side = "left" if centroid[0] < half_width else "right"
                 logger.debug(f"Track {track_id}: Not in any ROI, using X position: {side}")
             
-            # Log for debugging (only for first few tracks to avoid spam)
-            if track_id <= 5 or track_id % 50 == 0:
-                logger.info(f"Track {track_id}: centroid=({centroid[0]:.1f}, {centroid[1]:.1f}), frame_width={frame_width}, in_left_roi={in_left_roi}, in_right_roi={in_right_roi}, assigned_side={side}")
-            
-            if side is None:
-                continue
-            
             # Calculate bbox area (for determining closest point to camera)
             bbox_area = (x2 - x1) * (y2 - y1)
             
             # Track maximum area for this track_id (closest to camera = largest area)
-            max_area_updated = False
-            if track_id not in self.track_max_area:
-                self.track_max_area[track_id] = bbox_area
-                max_area_updated = True
-            else:
-                # Update max area if current is larger
-                if bbox_area > self.track_max_area[track_id]:
-                    self.track_max_area[track_id] = bbox_area
-                    max_area_updated = True
+            state = self._track_state(track_id)
+            max_area_updated = state.max_area is None or bbox_area > state.max_area
+            if max_area_updated:
+                state.max_area = bbox_area
+            
+            # Already counted on this side: nothing below can create another event
+            if state.counted_side == side:
+                continue
             
-            # Check if vehicle should be counted
-            # Only count if not already counted on this side
-            already_counted_side = self.counted_tracks.get(track_id)
-            if already_counted_side != side:  # Allow counting if not counted or counted on different side
-                side_config = self.roi_config[f"{side}_side"]
+            # Log for debugging (only for first few tracks to avoid spam)
+            if track_id <= 5 or track_id % 50 == 0:
+                logger.info(f"Track {track_id}: centroid=({centroid[0]:.1f}, {centroid[1]:.1f}), frame_width={frame_width}, in_left_roi={in_left_roi}, in_right_roi={in_right_roi}, assigned_side={side}")
+            
+            # Not counted yet, or counted on the other side: count if in this side's ROI (already tested above)
+            in_roi = in_left_roi if side == "left" else in_right_roi
+            
+            if in_roi:
+                # Count immediately when vehicle is detected in ROI (no history requirement);
+                # the check above guarantees this is the track's first event on this side
+                state.counted_side = side
+                logger.info(f"Track {track_id} counted on {side} side immediately after detection (centroid=({centroid[0]:.1f}, {centroid[1]:.1f}), in_roi={in_roi})")
+                
+                # Determine lane
+                lane = self._get_lane(centroid, side)
+                
+                # Color, make/model and plate are filled in later by _classify_event
+                # Take snapshot only once per track, if the current area is at least 95% of maximum area
+                # (vehicle is close to its closest point) or we just updated the maximum area
+                snapshot_path = None
+                snapshot_stamp = None
+                max_area = state.max_area
+                
+                if not state.snapshot_taken:
+                    if bbox_area >= max_area * 0.95 or max_area_updated:
+                        snapshot_path = self._save_snapshot(frame, bbox, track_id, now_ns)
+                        snapshot_stamp = now_ns
+                        state.snapshot_taken = True
+                        logger.info(f"Snapshot taken for track {track_id} at closest point (area={bbox_area:.0f}, max_area={max_area:.0f}, updated={max_area_updated})")
                 
-                # Check if vehicle is in ROI
-                in_roi = self._point_in_polygon(centroid, side_config["roi"]["polygon"])
+                # Create event: exactly one per track per side
+                event = {
+                    "ts": ts,
+                    "ts_epoch": ts_epoch,
+                    "side": side,
+                    "lane": lane,
+                    "direction": self._side_directions[side],
+                    "vehicle_type": vehicle_type,
+                    "color": "unknown",
+                    "make_model": "Vehicle",
+                    "make_model_conf": None,
+                    "snapshot_path": snapshot_path,
+                    "plate_number": "XXXXX",
+                    "plate_snapshot_path": None,
+                    "bbox": f"[{x1}, {y1}, {x2}, {y2}]",  # same text json.dumps gives
+                    "track_id": track_id,
+                    "source_meta": json.dumps({"confidence": det.get("confidence", 0.0)})
+                }
                 
-                if in_roi:
-                    # Count immediately when vehicle is detected in ROI
-                    # Create event as soon as vehicle is detected in ROI (no history requirement)
-                    history_len = len(self.track_history.get(track_id, []))
-                    
-                    # Mark as counted immediately when in ROI
-                    # This ensures we catch all vehicles as soon as they enter ROI
-                    if track_id not in self.counted_tracks or self.counted_tracks[track_id] != side:
-                        self.counted_tracks[track_id] = side
-                        logger.info(f"Track {track_id} counted on {side} side immediately after detection (centroid=({centroid[0]:.1f}, {centroid[1]:.1f}), in_roi={in_roi}, history_len={history_len})")
-                    
-                    # Determine lane
-                    lane = self._get_lane(centroid, side)
-                    
-                    # Classify color
-                    color = classify_color(frame, tuple(bbox))
-                    
-                    # Classify make/model (returns brand and body type)
+                events.append(event)
+                self.event_q.put((event, frame, bbox, snapshot_stamp))
+                logger.info(f"Event created for track {track_id} on {side} side")
+                
+                # Callback is called in main.py after process_frame
+                # (removed from here for proper async handling)
+    
+        return events
+    
+    def _event_writer(self):
+        """Saves queued events in batches, then hands them to on_created and the classifiers"""
+        while True:
+            batch = [self.event_q.get()]
+            while len(batch) < EVENT_BATCH_MAX:
+                try:
+                    batch.append(self.event_q.get_nowait())
+                except queue.Empty:
+                    break
+            
+            # None is put by close() after the last event, so it can only end a batch
+            stopping = batch[-1] is None
+            if stopping:
+                batch.pop()
+            if batch:
+                self._save_events([event for event, _, _, _ in batch])
+            
+            # Classify in the background; the frame (never modified after capture) is shared read-only
+            for event, frame, bbox, snapshot_stamp in batch:
+                if "id" not in event:
+                    continue
+                if self.on_created:
                     try:
-                        classification = classify_make_model(frame, tuple(bbox))
-                        brand = classification.get("brand", "Unknown")
-                        body_type = classification.get("body_type", "Vehicle")
-                        make_model_conf = classification.get("confidence", 0.2)
-                        # Store as "Brand - BodyType" for compatibility
-                        make_model = f"{brand} - {body_type}"
-                        logger.info(f"Classified vehicle {track_id} as {brand} {body_type} (confidence: {make_model_conf:.2f})")
+                        self.on_created(event)
                     except Exception as e:
-                        logger.warning(f"Error classifying make/model for track {track_id}: {e}")
-                        make_model, make_model_conf = "Unknown - Vehicle", 0.2
-                    
-                    # Create snapshot only once, when vehicle is closest to camera (maximum area)
-                    snapshot_path = None
-                    snapshot_already_taken = self.snapshot_taken.get(track_id, False)
-                    
-                    # Take snapshot only if:
-                    # 1. Snapshot not taken yet for this track_id
-                    # 2. Current area is at least 95% of maximum area (vehicle is close to closest point)
-                    # OR we just updated the maximum area (we're at a new closest point)
-                    max_area = self.track_max_area.get(track_id, bbox_area)
-                    snapshot_path = None
-                    plate_number = None
-                    plate_snapshot_path = None
-                    
-                    if not snapshot_already_taken:
-                        # Take snapshot if we're at 95%+ of max area, or if we just set a new maximum
-                        if bbox_area >= max_area * 0.95 or max_area_updated:
-                            snapshot_path, plate_number, plate_snapshot_path = self._save_snapshot(frame, bbox, track_id)
-                            self.snapshot_taken[track_id] = True
-                            logger.info(f"Snapshot taken for track {track_id} at closest point (area={bbox_area:.0f}, max_area={max_area:.0f}, updated={max_area_updated})")
-                            if plate_number:
-                                logger.info(f"Plate number for track {track_id}: {plate_number}")
-                    
-                    # Create event - only create if we just marked this track as counted
-                    # This ensures we create exactly one event per track per side
-                    if track_id in self.counted_tracks and self.counted_tracks[track_id] == side:
-                        event = {
-                            "ts": datetime.utcnow(),
-                            "side": side,
-                            "lane": lane,
-                            "direction": self.roi_config[f"{side}_side"]["direction"],
-                            "vehicle_type": vehicle_type,
-                            "color": color,
-                            "make_model": make_model or "Vehicle",
-                            "make_model_conf": make_model_conf,
-                            "snapshot_path": snapshot_path,
-                            "plate_number": plate_number or "XXXXX",
-                            "plate_snapshot_path": plate_snapshot_path,
-                            "bbox": json.dumps(bbox),
-                            "track_id": track_id,
-                            "source_meta": json.dumps({"confidence": det.get("confidence", 0.0)})
-                        }
-                        
-                        # Save to database
-                        self._save_event(event)
-                        
-                        events.append(event)
-                        logger.info(f"Event created for track {track_id} on {side} side")
-                    
-                    # Callback is called in main.py after process_frame
-                    # (removed from here for proper async handling)
-        
-        return events
+                        logger.error(f"Error in on_created callback: {e}")
+                self._classify_pool.submit(self._classify_event, dict(event), frame, bbox, snapshot_stamp)
+            
+            if stopping:
+                return
     
-    def _save_snapshot(self, frame: np.ndarray, bbox: List[int], track_id: int) -> Tuple[str, Optional[str], Optional[str]]:
+    def close(self):
+        """Saves the events still queued, then waits for the classifiers and snapshot writes to finish"""
+        self.event_q.put(None)
+        self._writer.join()
+        # Classification submits plate snapshots to the I/O pool, so it goes first
+        self._classify_pool.shutdown(wait=True)
+        self._io_pool.shutdown(wait=True)
+    
+    def _save_snapshot(self, frame: np.ndarray, bbox: Tuple[int, int, int, int], track_id: int, stamp: int) -> str:
         """
-        Saves snapshot and plate region.
-        Returns: (snapshot_path, plate_number, plate_snapshot_path)
+        Saves vehicle snapshot; stamp (Unix time in ns) goes into the filename.
+        Returns: snapshot_path
         """
         x1, y1, x2, y2 = bbox
         # Add small padding
@@ -321,37 +381,34 @@ class TrafficCounter:
         x2 = min(w, x2 + padding)
         y2 = min(h, y2 + padding)
         
-        snapshot = frame[y1:y2, x1:x2].copy()
+        # A view is enough: the frame is never modified after capture, so the writer can encode it later
+        snapshot = frame[y1:y2, x1:x2]
         
         # Save vehicle snapshot
-        os.makedirs(settings.snapshots_dir, exist_ok=True)
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')
-        filename = f"snapshot_{track_id}_{timestamp}.jpg"
+        filename = f"snapshot_{track_id}_{stamp}.jpg"
         filepath = os.path.join(settings.snapshots_dir, filename)
-        cv2.imwrite(filepath, snapshot)
+        self._io_pool.submit(_write_jpeg, filepath, snapshot, f"snapshot for track {track_id}")
         snapshot_path = f"/snapshots/{filename}"
         
-        # Extract and save plate region (always save, even if recognition fails)
+        return snapshot_path
+    
+    def _save_plate(self, frame: np.ndarray, bbox: Tuple[int, int, int, int], track_id: int,
+                    stamp: int) -> Dict:
+        """
+        Extracts, saves and recognizes the plate region.
+        Returns: {"plate_number": ..., "plate_snapshot_path": ...}
+        """
         plate_number = "XXXXX"
         plate_snapshot_path = None
         
         try:
             plate_roi = extract_plate_region(frame, bbox)
             if plate_roi is not None and plate_roi.size > 0:
-                # Always save plate snapshot
-                plate_filename = f"plate_{track_id}_{timestamp}.jpg"
+                # Always save plate snapshot (recognition below only reads plate_roi)
+                plate_filename = f"plate_{track_id}_{stamp}.jpg"
                 plate_filepath = os.path.join(settings.snapshots_dir, plate_filename)
-                
-                # Ensure directory exists
-                os.makedirs(settings.snapshots_dir, exist_ok=True)
-                
-                # Save plate image
-                success = cv2.imwrite(plate_filepath, plate_roi)
-                if success:
-                    plate_snapshot_path = f"/snapshots/{plate_filename}"
-                    logger.debug(f"Plate snapshot saved for track {track_id}: {plate_snapshot_path}")
-                else:
-                    logger.warning(f"Failed to save plate snapshot for track {track_id}")
+                self._io_pool.submit(_write_jpeg, plate_filepath, plate_roi, f"plate snapshot for track {track_id}")
+                plate_snapshot_path = f"/snapshots/{plate_filename}"
                 
                 # Try to recognize plate number
                 plate_number = recognize_plate_number(plate_roi)
@@ -363,20 +420,113 @@ class TrafficCounter:
             else:
                 # If plate region not found, log warning but still set default
                 logger.warning(f"Plate region not found for track {track_id}, bbox={bbox}")
-                plate_number = "XXXXX"
         except Exception as e:
             logger.error(f"Error processing plate for track {track_id}: {e}", exc_info=True)
             plate_number = "XXXXX"
         
-        return snapshot_path, plate_number, plate_snapshot_path
+        return {"plate_number": plate_number, "plate_snapshot_path": plate_snapshot_path}
     
-    def _save_event(self, event: Dict):
-        """Saves event to database"""
+    def _classify_vehicle(self, frame: np.ndarray, bbox: Tuple[int, int, int, int], track_id: int) -> Dict:
+        """Returns the vehicle's color and make/model fields"""
+        # Classify color
+        update = {"color": classify_color(frame, bbox)}
+        
+        # Classify make/model (returns brand and body type)
         try:
-            with get_session() as session:
-                db_event = TrafficEvent(**event)
-                session.add(db_event)
+            classification = classify_make_model(frame, bbox, track_id)
+            brand = classification.get("brand", "Unknown")
+            body_type = classification.get("body_type", "Vehicle")
+            make_model_conf = classification.get("confidence", 0.2)
+            # Store as "Brand - BodyType" for compatibility
+            update["make_model"] = f"{brand} - {body_type}"
+            update["make_model_conf"] = make_model_conf
+            logger.info(f"Classified vehicle {track_id} as {brand} {body_type} (confidence: {make_model_conf:.2f})")
+        except Exception as e:
+            logger.warning(f"Error classifying make/model for track {track_id}: {e}")
+            update["make_model"], update["make_model_conf"] = "Unknown - Vehicle", 0.2
+        
+        return update
+    
+    def _classify_event(self, event: Dict, frame: np.ndarray, bbox: Tuple[int, int, int, int],
+                        snapshot_stamp: Optional[int]):
+        """
+        Fills in color, make/model and plate for a saved event (runs on the classification pool),
+        updates its row and hands the completed event to on_update.
+        """
+        track_id = event["track_id"]
+        
+        # A vehicle's color and make/model don't change, so each track is classified once
+        with self._classifications_lock:
+            cached = self._classifications.get(track_id)
+        if cached is not None:
+            update = dict(cached)
+        else:
+            update = self._classify_vehicle(frame, bbox, track_id)
+            with self._classifications_lock:
+                self._classifications[track_id] = dict(update)
+                if len(self._classifications) > MAX_TRACKS:
+                    self._classifications.popitem(last=False)
+        
+        # Plate is read from the same frame the vehicle snapshot was taken from
+        if snapshot_stamp is not None:
+            update.update(self._save_plate(frame, bbox, track_id, snapshot_stamp))
+        
+        try:
+            with SessionManager() as session:
+                row = session.get(TrafficEvent, event["id"])
+                if row is None:
+                    return  # Already removed by cleanup
+                for field, value in update.items():
+                    setattr(row, field, value)
                 session.commit()
         except Exception as e:
-            logger.error(f"Error saving event: {e}")
-
+            logger.error(f"Error updating event {event['id']}: {e}")
+            return
+        
+        event.update(update)
+        if self.on_update is not None:
+            self.on_update(event)
+    
+    def _commit_events(self, events: List[Dict]):
+        """Saves events and bumps their /stats counters in a single commit; raises if it fails"""
+        with SessionManager() as session:
+            rows = [TrafficEvent(**event) for event in events]
+            session.add_all(rows)
+            
+            # Bump the per-minute counters read by /stats
+            buckets = Counter(
+                (event["side"], event["ts"].replace(second=0, microsecond=0)) for event in events
+            )
+            for (side, bucket_start), count in buckets.items():
+                bucket = session.get(TrafficCount, (side, bucket_start))
+                if bucket is None:
+                    session.add(TrafficCount(side=side, bucket_start=bucket_start, count=count))
+                else:
+                    bucket.count += count
+            
+            session.commit()
+        
+        for event, row in zip(events, rows):
+            event["id"] = row.id
+    
+    def _save_events(self, events: List[Dict]):
+        """
+        Saves a batch of events in a single commit. A failed commit (rolled back) is retried once,
+        then the events are saved one by one so a bad row only loses its own event.
+        """
+        for attempt in range(2):
+            try:
+                self._commit_events(events)
+                return
+            except Exception as e:
+                logger.warning(f"Error saving {len(events)} events (attempt {attempt + 1}): {e}")
+        
+        dropped = []
+        for event in events:
+            try:
+                self._commit_events([event])
+            except Exception as e:
+                logger.error(f"Error saving event for track {event['track_id']}: {e}")
+                dropped.append(event["track_id"])
+        if dropped:
+            logger.error(f"Dropped {len(dropped)} of {len(events)} events, track_ids={dropped}")
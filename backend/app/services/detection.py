@@ -1,3 +1,4 @@
+import os
 import cv2
 import numpy as np
 from ultralytics import YOLO
@@ -10,7 +11,7 @@ logger = logging.getLogger(__name__)
 
 class VehicleDetector:
     def __init__(self):
-        self.model = YOLO(settings.yolo_model)
+        self.model = YOLO(self._model_path(), task="detect")
         self.confidence_threshold = settings.confidence_threshold
         # Vehicle classes in COCO/YOLO: 2=car, 3=motorcycle, 5=bus, 7=truck
         self.vehicle_classes = [2, 3, 5, 7]
@@ -20,6 +21,25 @@ class VehicleDetector:
             5: "bus",
             7: "truck"
         }
+        if any(self.model.names.get(cls) != name for cls, name in self.class_names.items()):
+            logger.warning(f"Model class names don't match COCO vehicle classes: {self.model.names}")
+    
+    def _model_path(self) -> str:
+        """Returns the weights to load: a TensorRT FP16 engine next to the .pt if enabled, else settings.yolo_model"""
+        weights = settings.yolo_model
+        if not settings.yolo_tensorrt or not weights.endswith(".pt"):
+            return weights
+        
+        # Export once; the engine is reused on later starts
+        engine_path = os.path.splitext(weights)[0] + ".engine"
+        if not os.path.exists(engine_path):
+            try:
+                logger.info(f"Exporting {weights} to a TensorRT FP16 engine (one-time)...")
+                engine_path = YOLO(weights).export(format="engine", half=True)
+            except Exception as e:
+                logger.warning(f"TensorRT export failed, using {weights}: {e}")
+                return weights
+        return engine_path
     
     def detect(self, frame: np.ndarray) -> List[dict]:
         """
@@ -30,17 +50,20 @@ class VehicleDetector:
         detections = []
         
         for result in results:
-            boxes = result.boxes
-            for i in range(len(boxes)):
-                cls = int(boxes.cls[i])
-                if cls in self.vehicle_classes:
-                    conf = float(boxes.conf[i])
-                    x1, y1, x2, y2 = boxes.xyxy[i].cpu().numpy()
-                    detections.append({
-                        "bbox": [int(x1), int(y1), int(x2), int(y2)],
-                        "class": self.class_names[cls],
-                        "confidence": conf
-                    })
+            # One device-to-host copy per result, then filter vehicle classes with a mask
+            boxes = result.boxes.cpu().numpy()
+            classes = boxes.cls.astype(np.int64)
+            keep = np.isin(classes, self.vehicle_classes)
+            detections.extend(
+                {
+                    "bbox": bbox,
+                    "class": self.class_names[cls],
+                    "confidence": conf
+                }
+                for bbox, cls, conf in zip(
+                    boxes.xyxy[keep].astype(np.int32).tolist(), classes[keep].tolist(), boxes.conf[keep].tolist()
+                )
+            )
         
         return detections
 
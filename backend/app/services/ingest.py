@@ -1,17 +1,31 @@
 import cv2
 import subprocess
 import os
-import yt_dlp
+import queue
+import random
+import threading
+import time
 import logging
-from typing import Optional
+from typing import Optional, Tuple
 import numpy as np
 from app.core.config import settings
+from app.utils.youtube_info import extract_info, invalidate
 
 logger = logging.getLogger(__name__)
 
+# FFmpeg options OpenCV applies when opening a capture; an explicitly set environment value wins
+_USER_CAPTURE_OPTIONS = os.environ.get("OPENCV_FFMPEG_CAPTURE_OPTIONS")
+# Live sources: reconnect after network drops, no input buffering, short stream probing on open
+LIVE_CAPTURE_OPTIONS = (
+    "reconnect;1|reconnect_streamed;1|reconnect_delay_max;2|"
+    "fflags;nobuffer|flags;low_delay|probesize;500000|analyzeduration;1000000"
+)
+
 
 class VideoIngest:
     def __init__(self):
+        # Keep OpenCV's thread pool small so drawing/encoding don't compete with YOLO inference for cores
+        cv2.setNumThreads(settings.opencv_threads)
         self.cap: Optional[cv2.VideoCapture] = None
         self.process: Optional[subprocess.Popen] = None
         self.source_type = settings.video_source_type
@@ -42,51 +56,151 @@ class VideoIngest:
             self.source_file = None
         self.fps = settings.fps
         self.frame_skip = max(1, int(30 / self.fps))  # Frame skip for performance
+        # Stream properties, fixed for the session so they're read once when it opens
+        self.frame_size: Optional[Tuple[int, int]] = None  # (width, height)
+        self.source_fps: Optional[float] = None
+        # Set while frames come from an ffmpeg hardware-decode pipe instead of self.cap
+        self._first_frame: Optional[np.ndarray] = None  # frame read while verifying the pipe
+        # Decoded frames, filled by a reader thread so decoding overlaps frame processing
+        self._frames: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=2)
+        self._reader: Optional[threading.Thread] = None
+        self._stop_reader = threading.Event()
         
     def _get_youtube_stream_url(self, url: str) -> str:
         """Gets direct HLS/manifest URL via yt-dlp with retries"""
-        max_retries = 2
+        max_retries = 3
         for attempt in range(max_retries):
             try:
-                ydl_opts = {
-                    'format': 'worst[height<=480]/worst[height<=720]/worst',  # Lower quality for faster connection
-                    'quiet': True,
-                    'no_warnings': True,
-                    'socket_timeout': 20,  # Shorter timeout
-                    'extractor_args': {'youtube': {'player_client': ['android', 'web']}},  # Try mobile client
-                }
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=False)
-                    # Try to get HLS URL or direct link
-                    if 'url' in info:
-                        stream_url = info['url']
-                        logger.info(f"Successfully got YouTube stream URL (attempt {attempt + 1})")
+                # Shared with the location lookup, which reads title/description from the same metadata
+                info = extract_info(url)
+                # Try to get HLS URL or direct link
+                if 'url' in info:
+                    stream_url = info['url']
+                    logger.info(f"Successfully got YouTube stream URL (attempt {attempt + 1})")
+                    return stream_url
+                elif 'requested_formats' in info and len(info['requested_formats']) > 0:
+                    stream_url = info['requested_formats'][0].get('url', '')
+                    if stream_url:
+                        logger.info(f"Successfully got YouTube stream URL from formats (attempt {attempt + 1})")
                         return stream_url
-                    elif 'requested_formats' in info and len(info['requested_formats']) > 0:
-                        stream_url = info['requested_formats'][0].get('url', '')
-                        if stream_url:
-                            logger.info(f"Successfully got YouTube stream URL from formats (attempt {attempt + 1})")
-                            return stream_url
-                    else:
-                        raise ValueError("Could not extract stream URL from YouTube")
+                else:
+                    raise ValueError("Could not extract stream URL from YouTube")
             except Exception as e:
+                # Don't retry with the same cached metadata
+                invalidate(url)
                 if attempt < max_retries - 1:
                     logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying...")
-                    import time
-                    time.sleep(2)  # Wait before retry
+                    # Exponential backoff with jitter: ~1s, then ~2s
+                    time.sleep(min(30, 2 ** attempt + random.uniform(0, 0.5)))
                 else:
                     logger.error(f"All {max_retries} attempts failed. Last error: {e}")
                     raise ValueError(f"Failed to get YouTube stream after {max_retries} attempts: {e}")
     
+    def _forget_stream_url(self):
+        """Makes the next open extract a fresh YouTube stream URL instead of reusing the cached one"""
+        if self.source_type == "youtube_url" and self.source_url:
+            invalidate(self.source_url)
+    
+    def _capture(self, source: str) -> cv2.VideoCapture:
+        """Opens a cv2.VideoCapture with bounded decoder threads and the backend's frame queue kept to one frame"""
+        if self.source_type == "file":
+            if _USER_CAPTURE_OPTIONS is None:
+                os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = f"threads;{settings.decoder_threads}"
+            cap = cv2.VideoCapture(source)
+        else:
+            # Live sources go through the FFmpeg backend explicitly, the one that reads these options
+            if _USER_CAPTURE_OPTIONS is None:
+                options = f"threads;{settings.decoder_threads}|{LIVE_CAPTURE_OPTIONS}"
+                if self.source_type == "rtsp_url":
+                    options = f"rtsp_transport;tcp|{options}"
+                os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = options
+            cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG)
+        # Live sources otherwise queue several decoded frames, so we'd process stale ones
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+    
+    def _probe_size(self, source: str) -> Optional[Tuple[int, int]]:
+        """Returns (width, height) of the source's first video stream via ffprobe, or None"""
+        try:
+            result = subprocess.run(
+                ["ffprobe", "-v", "error", "-select_streams", "v:0",
+                 "-show_entries", "stream=width,height", "-of", "csv=p=0:s=x", source],
+                capture_output=True, text=True, timeout=20
+            )
+            width, height = result.stdout.strip().splitlines()[0].split("x")[:2]
+            return int(width), int(height)
+        except Exception as e:
+            logger.warning(f"ffprobe failed for stream: {e}")
+            return None
+    
+    def _open_ffmpeg(self, source: str) -> bool:
+        """
+        Decodes source with ffmpeg using settings.hw_accel, piping raw BGR frames at self.fps.
+        Returns False if ffmpeg can't start or decode it, so the caller falls back to OpenCV.
+        """
+        if settings.hw_accel == "none":
+            return False
+        size = self._probe_size(source)
+        if size is None:
+            return False
+        
+        argv = [
+            "ffmpeg", "-loglevel", "error", "-hwaccel", settings.hw_accel, "-i", source,
+            # Frame skip happens inside ffmpeg; decoded frames come back to system memory as BGR
+            "-vf", f"fps={self.fps}", "-an", "-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"
+        ]
+        try:
+            self.process = subprocess.Popen(argv, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL, bufsize=10**8)
+        except OSError as e:
+            logger.warning(f"Failed to start ffmpeg: {e}")
+            return False
+        self.frame_size = size
+        
+        # The first frame shows whether the hardware decoder actually works for this stream
+        self._first_frame = self._read_pipe_frame()
+        if self._first_frame is None:
+            logger.warning(f"ffmpeg -hwaccel {settings.hw_accel} produced no frames, falling back to OpenCV")
+            self.release()
+            return False
+        logger.info(f"Decoding {size[0]}x{size[1]} stream with ffmpeg -hwaccel {settings.hw_accel}")
+        return True
+    
+    def _read_pipe_frame(self) -> Optional[np.ndarray]:
+        """Reads one raw BGR frame from the ffmpeg pipe (a new buffer each time), or None at end of stream"""
+        width, height = self.frame_size
+        buffer = bytearray(width * height * 3)
+        view = memoryview(buffer)
+        filled = 0
+        while filled < len(buffer):
+            n = self.process.stdout.readinto(view[filled:])
+            if not n:
+                return None
+            filled += n
+        return np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+    
     def _open_stream(self):
-        """Opens video stream depending on source type"""
+        """Opens video stream depending on source type and starts reading frames in the background"""
+        self._open_source()
+        if self.cap is not None and self.cap.isOpened():
+            width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if width and height:
+                self.frame_size = (width, height)
+            self.source_fps = self.cap.get(cv2.CAP_PROP_FPS) or None
+        if self.is_opened():
+            self._stop_reader.clear()
+            self._reader = threading.Thread(target=self._read_loop, name="video-reader", daemon=True)
+            self._reader.start()
+    
+    def _open_source(self):
+        """Opens self.cap (or the ffmpeg pipe) depending on source type"""
         if self.source_type == "file":
             if not self.source_file:
                 raise ValueError("Video file path not specified")
             if not os.path.exists(self.source_file):
                 raise FileNotFoundError(f"Video file not found: {self.source_file}")
             logger.info(f"Opening video file: {self.source_file}")
-            self.cap = cv2.VideoCapture(self.source_file)
+            self.cap = self._capture(self.source_file)
             if not self.cap.isOpened():
                 raise ValueError(f"Failed to open video file: {self.source_file}")
             logger.info(f"Video file opened successfully. FPS: {self.cap.get(cv2.CAP_PROP_FPS):.2f}, Frames: {int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))}")
@@ -97,9 +211,12 @@ class VideoIngest:
             logger.info(f"Opening YouTube stream: {self.source_url}")
             try:
                 stream_url = self._get_youtube_stream_url(self.source_url)
+                if self._open_ffmpeg(stream_url):
+                    logger.info("YouTube stream opened successfully")
+                    return
                 logger.info(f"Got stream URL, opening with OpenCV...")
                 # Use OpenCV for YouTube
-                self.cap = cv2.VideoCapture(stream_url)
+                self.cap = self._capture(stream_url)
                 # Set connection timeout
                 self.cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 15000)
                 # Try to read a frame to verify connection
@@ -107,7 +224,7 @@ class VideoIngest:
                 if not ret or test_frame is None:
                     logger.warning("Failed to read test frame, retrying...")
                     self.cap.release()
-                    self.cap = cv2.VideoCapture(stream_url)
+                    self.cap = self._capture(stream_url)
                     self.cap.set(cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, 15000)
                 
                 if not self.cap.isOpened():
@@ -116,52 +233,135 @@ class VideoIngest:
                 logger.info("YouTube stream opened successfully")
             except Exception as e:
                 logger.error(f"Error opening YouTube stream: {e}")
-                # Don't raise immediately - let the retry mechanism handle it
+                # The signed stream URL may have expired; the retry extracts a new one
+                self._forget_stream_url()
                 raise
             
         elif self.source_type == "hls_url":
             if not self.source_url:
                 raise ValueError("HLS URL not provided")
-            self.cap = cv2.VideoCapture(self.source_url)
+            if not self._open_ffmpeg(self.source_url):
+                self.cap = self._capture(self.source_url)
             
         elif self.source_type == "rtsp_url":
             if not self.source_url:
                 raise ValueError("RTSP URL not provided")
-            self.cap = cv2.VideoCapture(self.source_url)
+            if not self._open_ffmpeg(self.source_url):
+                self.cap = self._capture(self.source_url)
             
         else:
             raise ValueError(f"Unknown source type: {self.source_type}")
     
+    def _read_loop(self):
+        """
+        Reader thread: decodes frames into the queue until the stream ends (then queues None).
+        Files block when the queue is full so no frame is lost; live sources drop the oldest
+        queued frame instead, so processing always gets the newest one.
+        """
+        cap = self.cap
+        try:
+            while not self._stop_reader.is_set():
+                try:
+                    frame = self._decode_frame()
+                except Exception as e:
+                    logger.error(f"Error reading frame: {e}")
+                    frame = None
+                while not self._stop_reader.is_set():
+                    try:
+                        if self.source_type == "file":
+                            self._frames.put(frame, timeout=0.5)
+                        else:
+                            if self._frames.full():
+                                self._frames.get_nowait()
+                            self._frames.put_nowait(frame)
+                        break
+                    except (queue.Full, queue.Empty):
+                        continue
+                if frame is None:
+                    return
+        finally:
+            # Stopped by release(), which may have given up waiting on a blocked read: free the capture here
+            if cap is not None and self._stop_reader.is_set():
+                cap.release()
+    
     def read_frame(self) -> Optional[np.ndarray]:
-        """Reads next frame"""
-        if self.cap:
-            ret, frame = self.cap.read()
+        """Returns the next decoded frame, or None if the stream ended or stalled"""
+        if self._reader is None:
+            frame = self._decode_frame()
+        else:
+            try:
+                frame = self._frames.get(timeout=10)
+            except queue.Empty:
+                logger.warning("No frame decoded for 10 seconds")
+                frame = None
+        if frame is None:
+            # The caller reconnects; a YouTube stream URL that stopped delivering shouldn't be reused
+            self._forget_stream_url()
+        return frame
+    
+    def _decode_frame(self) -> Optional[np.ndarray]:
+        """Reads the next frame from the source (a new array each time)"""
+        if self.process:
+            if self._first_frame is not None:
+                frame, self._first_frame = self._first_frame, None
+                return frame
+            return self._read_pipe_frame()
+        cap = self.cap  # release() may drop self.cap while a read is blocked
+        if cap:
+            ret, frame = cap.read()
             if not ret:
                 return None
-            # Frame skip
+            # Frame skip: grab() advances past a frame without converting and copying it out
             for _ in range(self.frame_skip - 1):
-                self.cap.read()
+                if not cap.grab():
+                    break
             return frame
         return None
     
     def is_opened(self) -> bool:
         """Checks if stream is opened"""
+        if self.process:
+            return self.process.poll() is None or self._first_frame is not None
         return self.cap is not None and self.cap.isOpened()
     
     def release(self):
         """Releases resources"""
+        if self._reader:
+            self._stop_reader.set()
+            if self.process:
+                self.process.kill()  # unblocks a reader waiting on the pipe
+            self._reader.join(timeout=5)
+            if self._reader.is_alive():
+                # Still blocked inside a network read; the reader releases the capture once that returns
+                logger.warning("Video reader thread didn't stop within 5 seconds")
+                self.cap = None
+            self._reader = None
+            self._frames = queue.Queue(maxsize=2)
+        if self.process:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+            self._first_frame = None
         if self.cap:
             self.cap.release()
             self.cap = None
+        self.frame_size = None
+        self.source_fps = None
     
     def get_fps(self) -> float:
         """Returns stream FPS"""
+        if self.process:
+            return float(self.fps)
+        if self.source_fps:
+            return self.source_fps
         if self.cap:
             return self.cap.get(cv2.CAP_PROP_FPS)
         return 30.0
     
     def get_size(self) -> tuple:
         """Returns frame size (width, height)"""
+        if self.frame_size:
+            return self.frame_size
         if self.cap:
             return (
                 int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
@@ -1,14 +1,83 @@
+import hashlib
+import json
 import logging
-import yt_dlp
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from typing import Optional, Dict
 from app.core.config import settings
+from app.utils.youtube_info import extract_info
 
 logger = logging.getLogger(__name__)
 
+# City mentions to look for in video metadata: (keyword, location, timezone)
+# Priority: more specific keywords first
+LOCATION_KEYWORDS = [
+    # Ocean City (priority - more specific first)
+    ('ocean city md', 'Ocean City, MD, USA', 'America/New_York'),
+    ('ocean city, md', 'Ocean City, MD, USA', 'America/New_York'),
+    ('ocean city', 'Ocean City, MD, USA', 'America/New_York'),
+    # Other cities
+    ('moscow', 'Moscow, Russia', 'Europe/Moscow'),
+    ('москва', 'Moscow, Russia', 'Europe/Moscow'),
+    ('spb', 'Saint Petersburg, Russia', 'Europe/Moscow'),
+    ('petersburg', 'Saint Petersburg, Russia', 'Europe/Moscow'),
+    ('new york', 'New York, USA', 'America/New_York'),
+    ('london', 'London, UK', 'Europe/London'),
+    ('tokyo', 'Tokyo, Japan', 'Asia/Tokyo'),
+    ('paris', 'Paris, France', 'Europe/Paris'),
+    ('berlin', 'Berlin, Germany', 'Europe/Berlin'),
+    ('los angeles', 'Los Angeles, USA', 'America/Los_Angeles'),
+    ('chicago', 'Chicago, USA', 'America/Chicago'),
+    ('miami', 'Miami, USA', 'America/New_York'),
+]
+_KEYWORD_PRIORITY = {keyword: i for i, (keyword, _, _) in enumerate(LOCATION_KEYWORDS)}
+# All keywords in one pattern, scanned once over the text. The lookahead reports a match at every
+# position (so overlapping mentions aren't skipped) and alternation order makes each position
+# report its highest-priority keyword.
+_KEYWORD_RE = re.compile("(?=(" + "|".join(re.escape(keyword) for keyword, _, _ in LOCATION_KEYWORDS) + "))")
+
+
+# Location found from YouTube metadata is reused across restarts for this long
+DISK_CACHE_TTL = 24 * 3600  # seconds
+
+# The yt-dlp lookup takes seconds; it runs here so request handlers never wait on it
+_lookup_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="location-lookup")
+
+
+def _disk_cache_path(url: str) -> str:
+    """Returns the file that stores the location found for a YouTube URL"""
+    return os.path.join(tempfile.gettempdir(), f"traffic_hud_location_{hashlib.sha1(url.encode()).hexdigest()}.json")
+
 
 class LocationService:
     def __init__(self):
         self.location_cache: Optional[Dict] = None
+        self._lookup: Optional[Future] = None  # running/last background YouTube lookup
+    
+    def _load_disk_cache(self, url: str) -> Optional[Dict]:
+        """Returns the location saved for url by an earlier run, if recent enough"""
+        path = _disk_cache_path(url)
+        try:
+            if time.time() - os.path.getmtime(path) > DISK_CACHE_TTL:
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _save_disk_cache(self, url: str, location_info: Dict):
+        """Saves the location found for url, atomically replacing any older file"""
+        path = _disk_cache_path(url)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(location_info, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to save location cache: {e}")
     
     def get_location_from_youtube(self, url: str) -> Optional[Dict]:
         """
@@ -16,109 +85,116 @@ class LocationService:
         Returns: {location: str, timezone: str} or None
         """
         try:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'extract_flat': False,
-            }
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                
-                # Try to get location from different fields
-                location = None
-                timezone = None
-                
-                # From description or title
-                title = info.get('title', '')
-                description = info.get('description', '')
-                uploader = info.get('uploader', '')
-                
+            # Usually already fetched by video ingest for the stream URL
+            info = extract_info(url)
+            
+            # Try to get location from different fields
+            location = None
+            timezone = None
+            
+            # From description or title
+            title = info.get('title', '')
+            description = info.get('description', '')
+            uploader = info.get('uploader', '')
+            # Metadata dumps below are only formatted when INFO logging is on
+            verbose = logger.isEnabledFor(logging.INFO)
+            
+            if verbose:
                 logger.info(f"Analyzing YouTube video: title='{title[:100]}'")
-                
-                # Simple parsing - search for city mentions
-                # Priority: more specific keywords first
-                location_keywords = [
-                    # Ocean City (priority - more specific first)
-                    ('ocean city md', 'Ocean City, MD, USA', 'America/New_York'),
-                    ('ocean city, md', 'Ocean City, MD, USA', 'America/New_York'),
-                    ('ocean city', 'Ocean City, MD, USA', 'America/New_York'),
-                    # Other cities
-                    ('moscow', 'Moscow, Russia', 'Europe/Moscow'),
-                    ('москва', 'Moscow, Russia', 'Europe/Moscow'),
-                    ('spb', 'Saint Petersburg, Russia', 'Europe/Moscow'),
-                    ('petersburg', 'Saint Petersburg, Russia', 'Europe/Moscow'),
-                    ('new york', 'New York, USA', 'America/New_York'),
-                    ('london', 'London, UK', 'Europe/London'),
-                    ('tokyo', 'Tokyo, Japan', 'Asia/Tokyo'),
-                    ('paris', 'Paris, France', 'Europe/Paris'),
-                    ('berlin', 'Berlin, Germany', 'Europe/Berlin'),
-                    ('los angeles', 'Los Angeles, USA', 'America/Los_Angeles'),
-                    ('chicago', 'Chicago, USA', 'America/Chicago'),
-                    ('miami', 'Miami, USA', 'America/New_York'),
-                ]
-                
-                text_to_search = f"{title} {description} {uploader}".lower()
+            
+            # Cam descriptions put the place up front; the cap bounds scans of very long descriptions
+            text_to_search = f"{title} {description[:2000]} {uploader}".lower()
+            if verbose:
                 logger.info(f"Searching for location in text (first 300 chars): {text_to_search[:300]}")
-                
-                # Improved search: first look for more specific matches
-                for keyword, loc, tz in location_keywords:
-                    # Check exact keyword match
-                    if keyword in text_to_search:
-                        location = loc
-                        timezone = tz
-                        logger.info(f"✓ Found location: {location} (matched keyword: '{keyword}')")
-                        logger.info(f"  Full title: {title}")
-                        break
-                
-                # If not found, try flexible search for Ocean City
-                if not location and ('ocean' in text_to_search and 'city' in text_to_search):
-                    # Check if "md" or "maryland" is nearby
-                    ocean_idx = text_to_search.find('ocean')
-                    city_idx = text_to_search.find('city', ocean_idx)
-                    if city_idx > ocean_idx and city_idx < ocean_idx + 20:  # "ocean" and "city" are close to each other
-                        # Check for "md" or "maryland" in text
-                        if ' md' in text_to_search or 'maryland' in text_to_search:
-                            location = 'Ocean City, MD, USA'
-                            timezone = 'America/New_York'
-                            logger.info(f"✓ Found location via flexible search: {location}")
-                
-                if location:
-                    return {
-                        'location': location,
-                        'timezone': timezone
-                    }
-                else:
-                    logger.warning(f"Could not determine location from YouTube metadata")
+            
+            # Highest-priority keyword mentioned anywhere in the text
+            matched = {m.group(1) for m in _KEYWORD_RE.finditer(text_to_search)}
+            if matched:
+                keyword, location, timezone = LOCATION_KEYWORDS[min(_KEYWORD_PRIORITY[k] for k in matched)]
+                logger.info(f"✓ Found location: {location} (matched keyword: '{keyword}')")
+                if verbose:
+                    logger.info(f"  Full title: {title}")
+            
+            # If not found, try flexible search for Ocean City
+            if not location and ('ocean' in text_to_search and 'city' in text_to_search):
+                # Check if "md" or "maryland" is nearby
+                ocean_idx = text_to_search.find('ocean')
+                city_idx = text_to_search.find('city', ocean_idx)
+                if city_idx > ocean_idx and city_idx < ocean_idx + 20:  # "ocean" and "city" are close to each other
+                    # Check for "md" or "maryland" in text
+                    if ' md' in text_to_search or 'maryland' in text_to_search:
+                        location = 'Ocean City, MD, USA'
+                        timezone = 'America/New_York'
+                        logger.info(f"✓ Found location via flexible search: {location}")
+            
+            if location:
+                return {
+                    'location': location,
+                    'timezone': timezone
+                }
+            else:
+                logger.warning(f"Could not determine location from YouTube metadata")
         except Exception as e:
             logger.error(f"Error getting location from YouTube: {e}", exc_info=True)
         
         return None
     
+    def _start_lookup(self, url: str) -> Future:
+        """Starts the YouTube location lookup in the background, unless one is already running"""
+        if self._lookup is None or self._lookup.done():
+            logger.info(f"🔍 Attempting to get location from YouTube: {url}")
+            self._lookup = _lookup_pool.submit(self.get_location_from_youtube, url)
+            self._lookup.add_done_callback(lambda future: self._lookup_done(url, future))
+        return self._lookup
+    
+    def _lookup_done(self, url: str, future: Future):
+        """Caches the location once the background lookup finds it"""
+        location_info = future.result()  # get_location_from_youtube handles its own errors
+        if location_info:
+            self.location_cache = location_info
+            self._save_disk_cache(url, location_info)
+            logger.info(f"✅ Location determined from YouTube: {location_info}")
+    
     def get_location(self, force_refresh: bool = False) -> Dict:
         """
         Gets stream location information.
-        First tries from YouTube, then from config, then default.
+        Uses STREAM_LOCATION if set explicitly, else tries YouTube, then the config default.
         """
         # If no refresh required and cache exists - return it
         if not force_refresh and self.location_cache:
             logger.debug(f"Returning cached location: {self.location_cache}")
             return self.location_cache
         
+        # A location set explicitly in .env/environment is used as is, without the yt-dlp lookup
+        if 'stream_location' in settings.model_fields_set and settings.stream_location:
+            self.location_cache = {
+                'location': settings.stream_location,
+                'timezone': settings.stream_timezone or 'UTC'
+            }
+            return self.location_cache
+        
         # Try to get from YouTube
         if settings.video_source_type == 'youtube_url' and settings.youtube_url:
+            # A previous run may already have determined it; skips the yt-dlp round-trip on restart
+            if not force_refresh:
+                location_info = self._load_disk_cache(settings.youtube_url)
+                if location_info:
+                    self.location_cache = location_info
+                    logger.info(f"Location loaded from disk cache: {location_info}")
+                    return location_info
+            # Don't wait for the lookup: until it finishes, the cached location (or config/default
+            # if none was resolved yet) is returned, then _lookup_done replaces it
             try:
-                logger.info(f"🔍 Attempting to get location from YouTube: {settings.youtube_url}")
-                location_info = self.get_location_from_youtube(settings.youtube_url)
+                location_info = self._start_lookup(settings.youtube_url).result(timeout=0)
                 if location_info:
                     self.location_cache = location_info
-                    logger.info(f"✅ Location determined from YouTube: {location_info}")
                     return location_info
-                else:
-                    logger.warning("⚠️ Could not determine location from YouTube metadata")
-            except Exception as e:
-                # Not critical error - just log and continue with default values
-                logger.warning(f"⚠️ Failed to get location from YouTube (will use default): {str(e)[:100]}")
-                # Don't log full traceback for timeouts - this is normal
+                logger.warning("⚠️ Could not determine location from YouTube metadata")
+            except FutureTimeoutError:
+                logger.info("YouTube location lookup still running, keeping the current location for now")
+            # A refresh that hasn't found anything must not overwrite a location resolved earlier
+            if self.location_cache:
+                return self.location_cache
         
         # Use settings from config or default
         location = getattr(settings, 'stream_location', None)
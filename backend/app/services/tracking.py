@@ -1,92 +1,110 @@
 import numpy as np
-from typing import List, Dict, Optional
-from collections import defaultdict
+from scipy.optimize import linear_sum_assignment
+from typing import List, Dict
 import logging
 
 logger = logging.getLogger(__name__)
 
+HISTORY_LEN = 10  # Centroids kept per track, for the velocity estimate and trails
+
 
 class SimpleTracker:
     """
     Improved tracker based on IoU with motion prediction.
     Uses velocity estimation for better track association.
+    Track state is stored as arrays indexed by slot; a slot with track_id 0 is free.
     """
-    def __init__(self, max_disappeared: int = 10, iou_threshold: float = 0.3, distance_threshold: float = 100.0):
+    def __init__(self, max_disappeared: int = 10, iou_threshold: float = 0.3, distance_threshold: float = 100.0,
+                 capacity: int = 64):
         self.next_id = 1
-        self.tracks: Dict[int, Dict] = {}  # track_id -> {bbox, class, last_seen_frame, velocity, history}
         self.max_disappeared = max_disappeared
         self.iou_threshold = iou_threshold
         self.distance_threshold = distance_threshold
         self.frame_count = 0
-    
-    def _iou(self, box1: List[int], box2: List[int]) -> float:
-        """Calculates IoU between two bboxes"""
-        x1_1, y1_1, x2_1, y2_1 = box1
-        x1_2, y1_2, x2_2, y2_2 = box2
-        
-        # Intersection
-        x1_i = max(x1_1, x1_2)
-        y1_i = max(y1_1, y1_2)
-        x2_i = min(x2_1, x2_2)
-        y2_i = min(y2_1, y2_2)
-        
-        if x2_i < x1_i or y2_i < y1_i:
-            return 0.0
-        
-        inter_area = (x2_i - x1_i) * (y2_i - y1_i)
-        box1_area = (x2_1 - x1_1) * (y2_1 - y1_1)
-        box2_area = (x2_2 - x1_2) * (y2_2 - y1_2)
-        union_area = box1_area + box2_area - inter_area
-        
-        if union_area == 0:
-            return 0.0
         
-        return inter_area / union_area
+        self.track_id = np.zeros(capacity, dtype=np.int64)
+        self.bbox = np.zeros((capacity, 4), dtype=np.float64)
+        # Derived from bbox when it's stored, so matching doesn't recompute them per frame
+        self.area = np.zeros(capacity, dtype=np.float64)
+        self.centroid = np.zeros((capacity, 2), dtype=np.float64)
+        self.track_class = np.empty(capacity, dtype=object)
+        self.last_seen = np.zeros(capacity, dtype=np.int64)
+        self.velocity = np.zeros((capacity, 2), dtype=np.float64)
+        # Ring buffer of recent centroids: history_head is the next slot to write
+        self.history = np.zeros((capacity, HISTORY_LEN, 2), dtype=np.float64)
+        self.history_head = np.zeros(capacity, dtype=np.int64)
+        self.history_len = np.zeros(capacity, dtype=np.int64)
     
-    def _centroid(self, bbox: List[int]) -> tuple:
-        """Calculates bbox center"""
-        x1, y1, x2, y2 = bbox
-        return ((x1 + x2) / 2, (y1 + y2) / 2)
+    def _grow(self):
+        """Doubles the number of track slots, keeping existing tracks"""
+        for name in ("track_id", "bbox", "area", "centroid", "track_class", "last_seen", "velocity",
+                     "history", "history_head", "history_len"):
+            old = getattr(self, name)
+            new = np.zeros((len(old) * 2,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
     
-    def _distance(self, p1: tuple, p2: tuple) -> float:
-        """Calculates Euclidean distance between two points"""
-        return np.sqrt((p1[0] - p2[0])**2 + (p1[1] - p2[1])**2)
+    def _free_slots(self, count: int) -> np.ndarray:
+        """Returns count unused slots, growing the arrays if needed"""
+        free = np.flatnonzero(self.track_id == 0)
+        while len(free) < count:
+            self._grow()
+            free = np.flatnonzero(self.track_id == 0)
+        return free[:count]
     
-    def _predict_position(self, track: Dict) -> tuple:
-        """Predicts next position based on velocity"""
-        if "velocity" not in track or track["velocity"] is None:
-            # If no velocity, return current centroid
-            bbox = track["bbox"]
-            return self._centroid(bbox)
-        
-        bbox = track["bbox"]
-        current_centroid = self._centroid(bbox)
-        velocity = track["velocity"]
-        
-        # Predict next position: current + velocity
-        predicted_x = current_centroid[0] + velocity[0]
-        predicted_y = current_centroid[1] + velocity[1]
-        
-        return (predicted_x, predicted_y)
+    def _iou_matrix(self, boxes1: np.ndarray, boxes2: np.ndarray, area1: np.ndarray, area2: np.ndarray) -> np.ndarray:
+        """Calculates IoU between every pair of bboxes: (N, 4) x (M, 4), with their areas -> (N, M)"""
+        # Intersection, one axis at a time (no (N, M, 4) temporary)
+        inter_w = np.minimum(boxes1[:, None, 2], boxes2[None, :, 2]) - np.maximum(boxes1[:, None, 0], boxes2[None, :, 0])
+        inter_h = np.minimum(boxes1[:, None, 3], boxes2[None, :, 3]) - np.maximum(boxes1[:, None, 1], boxes2[None, :, 1])
+        inter_area = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+        union_area = area1[:, None] + area2[None, :] - inter_area
+        
+        iou = np.zeros_like(inter_area)
+        np.divide(inter_area, union_area, out=iou, where=union_area != 0)
+        return iou
     
-    def _calculate_velocity(self, track: Dict) -> Optional[tuple]:
-        """Calculates velocity from track history"""
-        if "history" not in track or len(track["history"]) < 2:
-            return None
-        
-        history = track["history"]
-        if len(history) < 2:
-            return None
-        
-        # Use last two positions to estimate velocity
-        p1 = history[-2]
-        p2 = history[-1]
-        
-        # Simple velocity: difference between last two positions
-        vx = p2[0] - p1[0]
-        vy = p2[1] - p1[1]
-        
-        return (vx, vy)
+    def _centroids(self, boxes: np.ndarray) -> np.ndarray:
+        """Calculates bbox centers: (N, 4) -> (N, 2)"""
+        return (boxes[:, :2] + boxes[:, 2:]) / 2
+    
+    def _areas(self, boxes: np.ndarray) -> np.ndarray:
+        """Calculates bbox areas: (N, 4) -> (N,)"""
+        return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    
+    def _set_boxes(self, slots: np.ndarray, boxes: np.ndarray, areas: np.ndarray, centroids: np.ndarray):
+        """Stores new bboxes for slots along with their derived area and centroid"""
+        self.bbox[slots] = boxes
+        self.area[slots] = areas
+        self.centroid[slots] = centroids
+    
+    def _push_history(self, slots: np.ndarray, centroids: np.ndarray):
+        """Appends a centroid to each slot's history and recalculates its velocity"""
+        head = self.history_head[slots]
+        self.history[slots, head] = centroids
+        self.history_head[slots] = (head + 1) % HISTORY_LEN
+        self.history_len[slots] = np.minimum(self.history_len[slots] + 1, HISTORY_LEN)
+        
+        # Simple velocity: difference between the last two positions (none until there are two)
+        previous = self.history[slots, (head - 1) % HISTORY_LEN]
+        has_two = (self.history_len[slots] >= 2)[:, None]
+        self.velocity[slots] = np.where(has_two, centroids - previous, 0.0)
+    
+    def reset(self):
+        """Drops all tracks; ids keep counting up, so they stay unique across resets"""
+        self.track_id[:] = 0
+    
+    def histories(self) -> Dict[int, np.ndarray]:
+        """Returns track_id -> recent centroids (oldest first) for every live track"""
+        slots = np.flatnonzero(self.track_id)
+        # Unroll every ring buffer oldest-first at once; the last history_len entries are filled
+        order = (self.history_head[slots, None] + np.arange(HISTORY_LEN)) % HISTORY_LEN
+        unrolled = self.history[slots[:, None], order]
+        start = HISTORY_LEN - self.history_len[slots]
+        return {
+            track_id: points[first:]
+            for track_id, points, first in zip(self.track_id[slots].tolist(), unrolled, start.tolist())
+        }
     
     def update(self, detections: List[Dict]) -> List[Dict]:
         """
@@ -96,108 +114,85 @@ class SimpleTracker:
         self.frame_count += 1
         
         # Remove old tracks
-        tracks_to_remove = []
-        for track_id, track in self.tracks.items():
-            if self.frame_count - track["last_seen_frame"] > self.max_disappeared:
-                tracks_to_remove.append(track_id)
-        for track_id in tracks_to_remove:
-            del self.tracks[track_id]
+        expired = (self.track_id != 0) & (self.frame_count - self.last_seen > self.max_disappeared)
+        self.track_id[expired] = 0
         
         # If no detections, return empty list
         if not detections:
             return []
         
         # Improved matching: IoU + distance to predicted position
-        matched = set()
         updated_detections = []
         
-        # First pass: calculate velocities for all tracks
-        for track_id, track in self.tracks.items():
-            if "history" not in track:
-                track["history"] = []
-            # Add current position to history
-            current_centroid = self._centroid(track["bbox"])
-            track["history"].append(current_centroid)
-            # Limit history size
-            if len(track["history"]) > 10:
-                track["history"] = track["history"][-10:]
-            # Calculate velocity
-            track["velocity"] = self._calculate_velocity(track)
+        # Live tracks, oldest first
+        slots = np.flatnonzero(self.track_id)
+        slots = slots[np.argsort(self.track_id[slots])]
+        
+        det_boxes = np.array([d["bbox"] for d in detections], dtype=np.float64)
+        det_areas = self._areas(det_boxes)
+        det_centroids = self._centroids(det_boxes)
         
-        for detection in detections:
-            bbox = detection["bbox"]
-            detection_centroid = self._centroid(bbox)
+        # Scores for every (detection, track) pair at once; 0 marks pairs that can't match
+        assignment = {}  # detection index -> track index
+        if len(slots):
+            # Method 1: IoU matching (preferred for overlapping boxes)
+            iou = self._iou_matrix(det_boxes, self.bbox[slots], det_areas, self.area[slots])
+            iou_score = np.where(iou > self.iou_threshold, iou, 0.0)
             
-            best_score = -1.0
-            best_track_id = None
-            best_match_type = None  # "iou" or "distance"
+            # Method 2: Distance to predicted position (current + velocity from its last two detections)
+            predicted = self.centroid[slots] + self.velocity[slots]
+            offset = det_centroids[:, None, :] - predicted[None, :, :]
+            squared_distance = np.einsum("nmk,nmk->nm", offset, offset)
+            # Gate on squared distance; normalize the distance score only for pairs within range (closer = higher)
+            in_range = squared_distance < self.distance_threshold ** 2
+            distance_score = np.zeros_like(squared_distance)
+            distance_score[in_range] = 1.0 - np.sqrt(squared_distance[in_range]) / self.distance_threshold
             
-            for track_id, track in self.tracks.items():
-                if track_id in matched:
-                    continue
-                
-                # Method 1: IoU matching (preferred for overlapping boxes)
-                iou = self._iou(bbox, track["bbox"])
-                iou_score = iou if iou > self.iou_threshold else 0.0
-                
-                # Method 2: Distance to predicted position (for motion prediction)
-                predicted_pos = self._predict_position(track)
-                distance = self._distance(detection_centroid, predicted_pos)
-                distance_score = 0.0
-                if distance < self.distance_threshold:
-                    # Normalize distance score (closer = higher score)
-                    distance_score = 1.0 - (distance / self.distance_threshold)
-                
-                # Combined score: prefer IoU if high, otherwise use distance
-                if iou_score > 0.3:
-                    score = iou_score * 1.5  # Boost IoU score
-                    match_type = "iou"
-                else:
-                    score = distance_score
-                    match_type = "distance"
-                
-                if score > best_score and (iou_score > self.iou_threshold or distance_score > 0.3):
-                    best_score = score
-                    best_track_id = track_id
-                    best_match_type = match_type
+            # Combined score: prefer IoU if high (boosted), otherwise use distance
+            use_iou = iou_score > 0.3
+            candidates = (iou_score > self.iou_threshold) | (distance_score > 0.3)
+            scores = np.where(candidates, np.where(use_iou, iou_score * 1.5, distance_score), 0.0)
             
-            if best_track_id is not None:
+            # One-to-one assignment maximizing the total score (Hungarian, as in SORT)
+            for i, j in zip(*linear_sum_assignment(scores, maximize=True)):
+                if candidates[i, j]:
+                    assignment[i] = j
+        
+        matched_rows, matched_slots, new_rows = [], [], []
+        for i, detection in enumerate(detections):
+            if i in assignment:
                 # Update existing track
-                detection["track_id"] = best_track_id
-                track = self.tracks[best_track_id]
-                
-                # Update track with new detection
-                track["bbox"] = bbox
-                track["class"] = detection["class"]
-                track["last_seen_frame"] = self.frame_count
-                
-                # Update history
-                if "history" not in track:
-                    track["history"] = []
-                track["history"].append(detection_centroid)
-                if len(track["history"]) > 10:
-                    track["history"] = track["history"][-10:]
-                
-                # Recalculate velocity
-                track["velocity"] = self._calculate_velocity(track)
-                
-                matched.add(best_track_id)
-                logger.debug(f"Matched detection to track {best_track_id} using {best_match_type} (score: {best_score:.2f})")
+                j = assignment[i]
+                slot = slots[j]
+                detection["track_id"] = int(self.track_id[slot])
+                self.track_class[slot] = detection["class"]
+                matched_rows.append(i)
+                matched_slots.append(slot)
+                match_type = "iou" if use_iou[i, j] else "distance"
+                logger.debug(f"Matched detection to track {detection['track_id']} using {match_type} (score: {scores[i, j]:.2f})")
             else:
                 # Create new track
-                track_id = self.next_id
+                detection["track_id"] = self.next_id
                 self.next_id += 1
-                detection["track_id"] = track_id
-                self.tracks[track_id] = {
-                    "bbox": bbox,
-                    "class": detection["class"],
-                    "last_seen_frame": self.frame_count,
-                    "history": [detection_centroid],
-                    "velocity": None
-                }
-                logger.debug(f"Created new track {track_id}")
+                new_rows.append(i)
+                logger.debug(f"Created new track {detection['track_id']}")
             
             updated_detections.append(detection)
         
+        if matched_rows:
+            matched = np.array(matched_slots)
+            self._set_boxes(matched, det_boxes[matched_rows], det_areas[matched_rows], det_centroids[matched_rows])
+            self.last_seen[matched] = self.frame_count
+            self._push_history(matched, det_centroids[matched_rows])
+        
+        if new_rows:
+            new = self._free_slots(len(new_rows))
+            self.track_id[new] = [detections[i]["track_id"] for i in new_rows]
+            self._set_boxes(new, det_boxes[new_rows], det_areas[new_rows], det_centroids[new_rows])
+            self.track_class[new] = [detections[i]["class"] for i in new_rows]
+            self.last_seen[new] = self.frame_count
+            self.history_head[new] = 0
+            self.history_len[new] = 0
+            self._push_history(new, det_centroids[new_rows])
+        
         return updated_detections
-
@@ -1,7 +1,6 @@
 from typing import Tuple, Optional, Dict
 import cv2
 import numpy as np
-import random
 
 
 # Popular car brands
@@ -13,10 +12,18 @@ CAR_BRANDS = [
     "Land Rover", "Mitsubishi", "Mini", "Fiat", "Alfa Romeo", "Genesis"
 ]
 
+# Common brands per body type
+SEDAN_BRANDS = ("Toyota", "Honda", "Ford", "Nissan", "Hyundai", "Kia", "BMW", "Mercedes-Benz", "Audi", "Volkswagen", "Mazda")
+SUV_BRANDS = ("Toyota", "Honda", "Ford", "Jeep", "Chevrolet", "GMC", "BMW", "Mercedes-Benz", "Audi", "Lexus")
+TRUCK_BRANDS = ("Ford", "Chevrolet", "Ram", "GMC", "Toyota", "Nissan")
+VAN_BRANDS = ("Ford", "Mercedes-Benz", "Ram", "Chevrolet")
+OTHER_BRANDS = tuple(CAR_BRANDS[:10])
 
-def classify_make_model(frame, bbox: Tuple[int, int, int, int]) -> Dict[str, any]:
+
+def classify_make_model(frame, bbox: Tuple[int, int, int, int], track_id: Optional[int] = None) -> Dict[str, any]:
     """
     Enhanced classifier that determines both car brand (make) and body type.
+    The placeholder brand is picked by track_id (or by bbox if not given), so it's stable per vehicle.
     Returns dict with 'brand', 'body_type', and 'confidence'.
     """
     try:
@@ -106,26 +113,27 @@ def classify_make_model(frame, bbox: Tuple[int, int, int, int]) -> Dict[str, any
         brand_confidence = 0.2
         
         # Basic heuristics for brand detection (can be improved with ML)
-        # For now, randomly select from common brands based on body type
+        # For now, pick from common brands based on body type, deterministically per vehicle
         # In production, this should use image recognition
+        pick = track_id if track_id is not None else hash((x1, y1, x2, y2))
         if body_type in ["Sedan", "Coupe", "Hatchback", "Compact", "Subcompact"]:
             # Common sedan/compact brands
-            brand = random.choice(["Toyota", "Honda", "Ford", "Nissan", "Hyundai", "Kia", "BMW", "Mercedes-Benz", "Audi", "Volkswagen", "Mazda"])
+            brand = SEDAN_BRANDS[pick % len(SEDAN_BRANDS)]
             brand_confidence = 0.25
         elif body_type in ["SUV", "Large SUV", "Crossover"]:
             # Common SUV brands
-            brand = random.choice(["Toyota", "Honda", "Ford", "Jeep", "Chevrolet", "GMC", "BMW", "Mercedes-Benz", "Audi", "Lexus"])
+            brand = SUV_BRANDS[pick % len(SUV_BRANDS)]
             brand_confidence = 0.25
         elif body_type == "Truck":
             # Common truck brands
-            brand = random.choice(["Ford", "Chevrolet", "Ram", "GMC", "Toyota", "Nissan"])
+            brand = TRUCK_BRANDS[pick % len(TRUCK_BRANDS)]
             brand_confidence = 0.3
         elif body_type == "Van":
             # Common van brands
-            brand = random.choice(["Ford", "Mercedes-Benz", "Ram", "Chevrolet"])
+            brand = VAN_BRANDS[pick % len(VAN_BRANDS)]
             brand_confidence = 0.3
         else:
-            brand = random.choice(CAR_BRANDS[:10])
+            brand = OTHER_BRANDS[pick % len(OTHER_BRANDS)]
             brand_confidence = 0.2
         
         # Overall confidence is average of brand and body type confidence
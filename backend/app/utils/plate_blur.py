@@ -3,63 +3,59 @@ import numpy as np
 from typing import Tuple, Optional
 
 
-def detect_plate_region(bbox: Tuple[int, int, int, int], frame_height: int, frame_width: int) -> Optional[Tuple[int, int, int, int]]:
+def _plate_bbox(bbox: Tuple[int, int, int, int], frame_height: int, frame_width: int,
+                height_frac: float, width_frac: float, bottom_margin_frac: float) -> Optional[Tuple[int, int, int, int]]:
     """
-    Heuristic detection of license plate region.
-    Returns (x1, y1, x2, y2) or None.
+    Region of the given fraction of bbox height/width, centered by width and bottom_margin_frac
+    of the height above the bbox bottom, clamped to the frame. Returns (x1, y1, x2, y2) or None if empty.
     """
     x1, y1, x2, y2 = bbox
     width = x2 - x1
     height = y2 - y1
     
-    # Plate is usually in lower central part of vehicle
-    # Approximately 10-20% of bbox height, centered by width
-    plate_height = int(height * 0.15)
-    plate_width = int(width * 0.4)
-    
+    plate_height = int(height * height_frac)
+    plate_width = int(width * width_frac)
     plate_x1 = x1 + (width - plate_width) // 2
-    plate_y1 = y2 - plate_height - int(height * 0.05)
-    plate_x2 = plate_x1 + plate_width
-    plate_y2 = plate_y1 + plate_height
+    plate_y1 = y2 - plate_height - int(height * bottom_margin_frac)
     
     # Boundary check
+    plate_x2 = min(frame_width, plate_x1 + plate_width)
+    plate_y2 = min(frame_height, plate_y1 + plate_height)
     plate_x1 = max(0, plate_x1)
     plate_y1 = max(0, plate_y1)
-    plate_x2 = min(frame_width, plate_x2)
-    plate_y2 = min(frame_height, plate_y2)
     
     if plate_x2 > plate_x1 and plate_y2 > plate_y1:
         return (plate_x1, plate_y1, plate_x2, plate_y2)
     return None
 
 
+def detect_plate_region(bbox: Tuple[int, int, int, int], frame_height: int, frame_width: int) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Heuristic detection of license plate region.
+    Returns (x1, y1, x2, y2) or None.
+    """
+    # Plate is usually in lower central part of vehicle
+    # Approximately 10-20% of bbox height, centered by width
+    return _plate_bbox(bbox, frame_height, frame_width, 0.15, 0.4, 0.05)
+
+
 def blur_plate_region(frame: np.ndarray, bbox: Tuple[int, int, int, int]) -> np.ndarray:
     """
     Blurs license plate region in frame.
     """
     frame_height, frame_width = frame.shape[:2]
-    plate_region = detect_plate_region(bbox, frame_height, frame_width)
-    
+    # Conservative fallback: blur lower central part
+    plate_region = (detect_plate_region(bbox, frame_height, frame_width)
+                    or _plate_bbox(bbox, frame_height, frame_width, 0.2, 0.5, 0.0))
     if plate_region is None:
-        # Conservative approach: blur lower central part
-        x1, y1, x2, y2 = bbox
-        width = x2 - x1
-        height = y2 - y1
-        plate_height = int(height * 0.2)
-        plate_width = int(width * 0.5)
-        plate_x1 = max(0, x1 + (width - plate_width) // 2)
-        plate_y1 = max(0, y2 - plate_height)
-        plate_x2 = min(frame_width, plate_x1 + plate_width)
-        plate_y2 = min(frame_height, plate_y1 + plate_height)
-        plate_region = (plate_x1, plate_y1, plate_x2, plate_y2)
+        return frame
     
     x1, y1, x2, y2 = plate_region
     
-    # Apply strong blur (Gaussian blur)
+    # Pixelate: average down to coarse blocks (about 16x8 px), then scale back up without smoothing
     roi = frame[y1:y2, x1:x2]
-    if roi.size > 0:
-        blurred = cv2.GaussianBlur(roi, (51, 51), 0)
-        frame[y1:y2, x1:x2] = blurred
+    height, width = roi.shape[:2]
+    small = cv2.resize(roi, (max(1, width // 16), max(1, height // 8)), interpolation=cv2.INTER_AREA)
+    frame[y1:y2, x1:x2] = cv2.resize(small, (width, height), interpolation=cv2.INTER_NEAREST)
     
     return frame
-
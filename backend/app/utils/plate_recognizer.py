@@ -13,6 +13,22 @@ except ImportError:
     TESSERACT_AVAILABLE = False
     logger.warning("pytesseract not available. License plate recognition will be disabled.")
 
+# Crops smaller or squarer than this can't hold a readable plate; OCR isn't attempted on them
+MIN_PLATE_PIXELS = 2000
+MIN_PLATE_ASPECT = 1.3
+# Plate crops are scaled to this height (px) for OCR; with padding, characters land near Tesseract's ~30 px sweet spot
+OCR_PLATE_HEIGHT = 48
+# Vehicle crops smaller than this (either side, px) skip contour search; the plate would be a few pixels
+MIN_CONTOUR_ROI = 80
+# Larger crops are shrunk to this size (longer side, px) for the contour search; its filters are relative
+CONTOUR_ROI_MAX_SIZE = 200
+
+_NON_ALNUM_RE = re.compile(r'[^A-Z0-9]')
+# Digits Tesseract commonly reads for letters on plates
+_OCR_FIXES = str.maketrans({'0': 'O', '1': 'I', '5': 'S'})
+# Closes the gaps between plate characters in the contour search
+_MORPH_KERNEL_3 = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
 
 def preprocess_plate_image(plate_roi: np.ndarray) -> np.ndarray:
     """
@@ -22,21 +38,22 @@ def preprocess_plate_image(plate_roi: np.ndarray) -> np.ndarray:
     if len(plate_roi.shape) == 3:
         gray = cv2.cvtColor(plate_roi, cv2.COLOR_BGR2GRAY)
     else:
-        gray = plate_roi.copy()
+        gray = plate_roi  # not modified below; resize/threshold make new images
     
-    # Resize if too small (OCR works better on larger images)
+    # Scale to a fixed height, keeping aspect: big enough for OCR, and no bigger input than it needs
     h, w = gray.shape
-    if h < 50 or w < 100:
-        scale = max(50 / h, 100 / w)
-        new_w = int(w * scale)
-        new_h = int(h * scale)
-        gray = cv2.resize(gray, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
+    if h != OCR_PLATE_HEIGHT:
+        scale = OCR_PLATE_HEIGHT / h
+        new_w = max(1, int(w * scale))
+        interpolation = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_LINEAR
+        gray = cv2.resize(gray, (new_w, OCR_PLATE_HEIGHT), interpolation=interpolation)
     
-    # Apply threshold to get binary image
-    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # Apply threshold to get binary image (in place when gray is our own buffer, not the caller's)
+    owned = gray is not plate_roi
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=gray if owned else None)
     
-    # Denoise
-    denoised = cv2.fastNlMeansDenoising(binary, None, 10, 7, 21)
+    # Denoise: drop isolated specks (median, since the image is already binary)
+    denoised = cv2.medianBlur(binary, 3)
     
     return denoised
 
@@ -49,6 +66,10 @@ def recognize_plate_number(plate_roi: np.ndarray) -> str:
     if not TESSERACT_AVAILABLE:
         return "XXXXX"
     
+    h, w = plate_roi.shape[:2]
+    if h * w < MIN_PLATE_PIXELS or w / max(h, 1) < MIN_PLATE_ASPECT:
+        return "XXXXX"
+    
     try:
         # Preprocess image
         processed = preprocess_plate_image(plate_roi)
@@ -63,12 +84,12 @@ def recognize_plate_number(plate_roi: np.ndarray) -> str:
         # Clean up text
         text = text.strip().upper()
         # Remove spaces and special characters, keep only alphanumeric
-        text = re.sub(r'[^A-Z0-9]', '', text)
+        text = _NON_ALNUM_RE.sub('', text)
         
         # Validate: should be 5-8 characters (typical license plate length)
         if len(text) >= 3 and len(text) <= 10:
             # Filter out common OCR errors
-            text = text.replace('0', 'O').replace('1', 'I').replace('5', 'S')
+            text = text.translate(_OCR_FIXES)
             return text
         else:
             return "XXXXX"
@@ -83,71 +104,60 @@ def detect_plate_contours(vehicle_roi: np.ndarray) -> Optional[Tuple[int, int, i
     Detects license plate using contour analysis.
     Returns (x, y, w, h) relative to vehicle_roi or None.
     """
-    # Convert to grayscale
+    if vehicle_roi.shape[0] < MIN_CONTOUR_ROI or vehicle_roi.shape[1] < MIN_CONTOUR_ROI:
+        return None
+    
+    # Green channel as grayscale: good enough for finding contours, without a color conversion pass
     if len(vehicle_roi.shape) == 3:
-        gray = cv2.cvtColor(vehicle_roi, cv2.COLOR_BGR2GRAY)
+        gray = cv2.extractChannel(vehicle_roi, 1)
     else:
         gray = vehicle_roi.copy()
     
+    # Shrink large crops (bilinear: INTER_AREA at fractional scales costs more than it saves)
+    scale = min(1.0, CONTOUR_ROI_MAX_SIZE / max(gray.shape))
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+    
     # Apply adaptive threshold to find text-like regions
     binary = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
                                    cv2.THRESH_BINARY_INV, 11, 2)
     
     # Morphological operations to connect text characters
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-    morph = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, iterations=2)
+    morph = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, _MORPH_KERNEL_3, iterations=2)
     
-    # Find contours
-    contours, _ = cv2.findContours(morph, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # Bounding boxes of the connected regions, in one pass: (x, y, w, h, pixel count) per label, 0 = background
+    _, _, stats, _ = cv2.connectedComponentsWithStats(morph, connectivity=8)
+    x, y, w, h = (stats[1:, k] for k in range(4))
+    roi_h, roi_w = gray.shape
     
-    if not contours:
-        return None
+    # Filter by size (should be significant but not too large)
+    # License plates are typically 15-50% of vehicle width and 5-20% of height
+    sized = (w >= roi_w * 0.12) & (h >= roi_h * 0.04) & (w <= roi_w * 0.6) & (h <= roi_h * 0.25)
     
-    # Filter contours by aspect ratio and size (license plates are typically wide rectangles)
-    plate_candidates = []
-    roi_h, roi_w = gray.shape
+    # Filter by aspect ratio (plates are typically 2:1 to 5:1 width:height)
+    aspect_ratio = w / np.maximum(h, 1)
+    # Prefer regions in the lower 30% of the vehicle (where plates actually are)
+    y_ratio = y / roi_h
+    keep = np.flatnonzero(sized & (aspect_ratio >= 1.8) & (aspect_ratio <= 5.5) & (y_ratio >= 0.70))
     
-    for contour in contours:
-        x, y, w, h = cv2.boundingRect(contour)
-        
-        # Filter by size (should be significant but not too large)
-        # License plates are typically 15-50% of vehicle width and 5-20% of height
-        if w < roi_w * 0.12 or h < roi_h * 0.04:
-            continue
-        if w > roi_w * 0.6 or h > roi_h * 0.25:
-            continue
-        
-        # Filter by aspect ratio (plates are typically 2:1 to 5:1 width:height)
-        aspect_ratio = w / h if h > 0 else 0
-        if 1.8 <= aspect_ratio <= 5.5:  # More strict aspect ratio
-            # Prefer contours in lower 70-95% of vehicle (not just lower half)
-            y_ratio = y / roi_h if roi_h > 0 else 0
-            if y_ratio >= 0.70:  # Lower 30% of vehicle (where plates actually are)
-                # Calculate area for sorting
-                area = w * h
-                plate_candidates.append((x, y, w, h, aspect_ratio, y_ratio, area))
-    
-    if not plate_candidates:
+    if not len(keep):
         return None
     
-    # Sort by: 1) lower position (higher y_ratio), 2) better aspect ratio (closer to 3:1), 3) larger area
-    # Prefer aspect ratio around 3:1 (typical for license plates)
-    plate_candidates.sort(key=lambda c: (
-        -c[5],  # Lower position (higher y_ratio) - most important
-        -abs(c[4] - 3.0),  # Aspect ratio closer to 3:1
-        -c[6]  # Larger area
-    ))
-    
-    # Return best candidate
-    best = plate_candidates[0]
-    return (best[0], best[1], best[2], best[3])
+    # Rank by: 1) lower position (higher y_ratio), 2) aspect ratio further from 3:1, 3) larger area
+    # (lexsort's last key is the primary one)
+    area = w[keep] * h[keep]
+    best_index = keep[np.lexsort((-area, -np.abs(aspect_ratio[keep] - 3.0), -y_ratio[keep]))[0]]
+    best = (x[best_index], y[best_index], w[best_index], h[best_index])
+    
+    # Return best candidate, in the original crop's coordinates
+    return tuple(int(v / scale) for v in best)
 
 
 def extract_plate_region(frame: np.ndarray, bbox: Tuple[int, int, int, int]) -> Optional[np.ndarray]:
     """
     Extracts license plate region from vehicle bbox using improved detection.
     First tries contour-based detection, falls back to heuristic if needed.
-    Returns plate ROI or None if not found.
+    Returns plate ROI (a view into frame, don't modify it) or None if not found.
     """
     x1, y1, x2, y2 = bbox
     h, w = frame.shape[:2]
@@ -161,13 +171,13 @@ def extract_plate_region(frame: np.ndarray, bbox: Tuple[int, int, int, int]) ->
     if x2 <= x1 or y2 <= y1:
         return None
     
-    # Extract vehicle region
-    vehicle_roi = frame[y1:y2, x1:x2].copy()
+    # Extract vehicle region (a view: it's only read)
+    vehicle_roi = frame[y1:y2, x1:x2]
     
     if vehicle_roi.size == 0:
         return None
     
-    # Try contour-based detection first
+    # Try contour-based detection first (too small crops go straight to the heuristic)
     plate_rect = detect_plate_contours(vehicle_roi)
     
     if plate_rect:
@@ -0,0 +1,49 @@
+import asyncio
+import functools
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+def ttl_cache(ttl: float, maxsize: int = 128) -> Callable:
+    """
+    Caches results of an async function for `ttl` seconds, keyed by its arguments.
+    Concurrent callers with the same key share one in-flight call.
+    Failed calls are not cached.
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        cache: Dict[Hashable, Tuple[float, asyncio.Task]] = {}
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+
+            entry = cache.get(key)
+            if entry is not None and entry[0] > now:
+                task = entry[1]
+            else:
+                task = asyncio.ensure_future(func(*args, **kwargs))
+                cache[key] = (now + ttl, task)
+                if len(cache) > maxsize:
+                    _evict(cache, now, maxsize)
+
+            try:
+                # Shield so a cancelled caller doesn't cancel the shared call
+                return await asyncio.shield(task)
+            except Exception:
+                if cache.get(key, (None, None))[1] is task:
+                    del cache[key]
+                raise
+
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
+
+
+def _evict(cache: Dict[Hashable, Tuple[float, asyncio.Task]], now: float, maxsize: int):
+    """Drops expired entries, then the oldest ones until the cache fits"""
+    for key in [k for k, (expires, _) in cache.items() if expires <= now]:
+        del cache[key]
+    while len(cache) > maxsize:
+        del cache[next(iter(cache))]
@@ -13,10 +13,16 @@ VEHICLE_COLORS = {
 # Color for tracks
 TRACK_COLOR = (0, 255, 255)  # Cyan
 
+# Detection label text
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+_FONT_SCALE = 0.6
+_FONT_THICK = 2
+
 
 def draw_detections(frame: np.ndarray, detections: List[Dict], 
                    show_track_id: bool = True, show_confidence: bool = True,
-                   track_histories: Optional[Dict[int, List[Tuple[float, float]]]] = None) -> np.ndarray:
+                   track_histories: Optional[Dict[int, List[Tuple[float, float]]]] = None,
+                   inplace: bool = False) -> np.ndarray:
     """
     Draws bounding boxes, labels, and track trails on frame.
     
@@ -26,11 +32,12 @@ def draw_detections(frame: np.ndarray, detections: List[Dict],
         show_track_id: Whether to show track_id
         show_confidence: Whether to show confidence
         track_histories: Optional dict of track_id -> list of (x, y) centroids for drawing trails
+        inplace: Draw on frame itself instead of a copy
     
     Returns:
         Frame with drawn bounding boxes and trails
     """
-    frame_copy = frame.copy()
+    frame_copy = frame if inplace else frame.copy()
     
     # Draw track trails first (so boxes appear on top)
     if track_histories:
@@ -77,14 +84,9 @@ def draw_detections(frame: np.ndarray, detections: List[Dict],
         
         label = " ".join(label_parts)
         
-        # Text size
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        font_scale = 0.6
-        font_thickness = 2
-        
         # Calculate text size for background
         (text_width, text_height), baseline = cv2.getTextSize(
-            label, font, font_scale, font_thickness
+            label, _FONT, _FONT_SCALE, _FONT_THICK
         )
         
         # Draw text background
@@ -102,28 +104,29 @@ def draw_detections(frame: np.ndarray, detections: List[Dict],
             frame_copy,
             label,
             (x1 + 2, label_y - 2),
-            font,
-            font_scale,
+            _FONT,
+            _FONT_SCALE,
             (0, 0, 0),  # Black text
-            font_thickness,
+            _FONT_THICK,
             cv2.LINE_AA
         )
     
     return frame_copy
 
 
-def draw_counting_lines(frame: np.ndarray, roi_config: Dict) -> np.ndarray:
+def draw_counting_lines(frame: np.ndarray, roi_config: Dict, inplace: bool = False) -> np.ndarray:
     """
     Draws counting lines on frame.
     
     Args:
         frame: Input frame
         roi_config: ROI configuration with counting lines
+        inplace: Draw on frame itself instead of a copy
     
     Returns:
         Frame with drawn lines
     """
-    frame_copy = frame.copy()
+    frame_copy = frame if inplace else frame.copy()
     
     for side_name in ["left_side", "right_side"]:
         if side_name not in roi_config:
@@ -133,21 +136,21 @@ def draw_counting_lines(frame: np.ndarray, roi_config: Dict) -> np.ndarray:
         counting_line = side_config.get("counting_line", {})
         
         if "start" in counting_line and "end" in counting_line:
-            start = counting_line["start"]
-            end = counting_line["end"]
+            start = (int(counting_line["start"][0]), int(counting_line["start"][1]))
+            end = (int(counting_line["end"][0]), int(counting_line["end"][1]))
             
             # Draw counting line (yellow)
             cv2.line(
                 frame_copy,
-                (int(start[0]), int(start[1])),
-                (int(end[0]), int(end[1])),
+                start,
+                end,
                 (0, 255, 255),  # Yellow
                 2
             )
             
             # Line label
-            mid_x = (int(start[0]) + int(end[0])) // 2
-            mid_y = (int(start[1]) + int(end[1])) // 2
+            mid_x = (start[0] + end[0]) // 2
+            mid_y = (start[1] + end[1]) // 2
             
             label = side_config.get("name", side_name).upper()
             cv2.putText(
@@ -0,0 +1,66 @@
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Tuple
+
+# Stream URLs inside the metadata are signed and expire after a few hours
+INFO_TTL = 3600  # seconds
+
+# Used by both video ingest and location lookup, so one extraction serves both
+YDL_OPTS = {
+    'format': 'worst[height<=480]/worst[height<=720]/worst',  # Lower quality for faster connection
+    'quiet': True,
+    'no_warnings': True,
+    'socket_timeout': 20,  # Shorter timeout
+    'extractor_args': {'youtube': {'player_client': ['android', 'web']}},  # Try mobile client
+}
+
+_cache: Dict[str, Tuple[float, Dict]] = {}
+# Extractions in progress, so concurrent callers for the same URL share one
+_pending: Dict[str, Future] = {}
+_lock = threading.Lock()  # Guards _cache and _pending only, never held during the network call
+
+
+def extract_info(url: str) -> Dict:
+    """
+    Returns yt-dlp metadata for a YouTube URL, reusing a result fetched within INFO_TTL.
+    Concurrent callers wait for one extraction instead of each calling YouTube. Failures are not cached.
+    """
+    with _lock:
+        entry = _cache.get(url)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        future = _pending.get(url)
+        owner = future is None
+        if owner:
+            future = _pending[url] = Future()
+    
+    if not owner:
+        return future.result()
+    
+    try:
+        # Imported on first use: yt-dlp is slow to import and unused for file/HLS/RTSP sources
+        import yt_dlp
+        with yt_dlp.YoutubeDL(YDL_OPTS) as ydl:
+            info = ydl.extract_info(url, download=False)
+    except BaseException as e:
+        with _lock:
+            if _pending.get(url) is future:
+                del _pending[url]
+        future.set_exception(e)
+        raise
+    
+    with _lock:
+        # Skipped if invalidate() ran meanwhile: the URLs may already be the ones it was called for
+        if _pending.get(url) is future:
+            del _pending[url]
+            _cache[url] = (time.monotonic() + INFO_TTL, info)
+    future.set_result(info)
+    return info
+
+
+def invalidate(url: str):
+    """Drops the cached metadata for url, so the next extract_info fetches fresh (newly signed) stream URLs"""
+    with _lock:
+        _cache.pop(url, None)
+        _pending.pop(url, None)
@@ -1,4 +1,4 @@
-import { useEffect, useState, useRef, useCallback } from 'react'
+import { useEffect, useState, useCallback } from 'react'
 import { Header } from './components/Header'
 import { StatusBar } from './components/StatusBar'
 import { UnifiedSidePanel } from './components/SidePanel'
@@ -13,7 +13,6 @@ function App() {
   const [rightEvents, setRightEvents] = useState<TrafficEvent[]>([])
   const [status, setStatus] = useState<'live' | 'error' | 'loading'>('loading')
   const [streamInfo, setStreamInfo] = useState<{ location: string; timezone: string; city: string } | null>(null)
-  const videoImgRef = useRef<HTMLImageElement>(null)
   const [videoError, setVideoError] = useState(false)
 
   // Debug: Log when component mounts
@@ -24,25 +23,6 @@ function App() {
     console.log('Stream info:', streamInfo)
   }, [status, stats, streamInfo])
 
-  // Video stream update - moved to top level
-  const updateVideoStream = useCallback(() => {
-    const img = videoImgRef.current
-    if (img && !videoError) {
-      // Add timestamp to bypass cache and force reload
-      const timestamp = Date.now()
-      img.src = `/api/video-stream?t=${timestamp}`
-      // Force reload if image fails to update
-      img.onerror = () => {
-        console.warn('Video frame failed to load, retrying...')
-        setTimeout(() => {
-          if (img && !videoError) {
-            img.src = `/api/video-stream?t=${Date.now()}`
-          }
-        }, 100)
-      }
-    }
-  }, [videoError])
-
   const loadData = useCallback(async () => {
     try {
       setStatus('loading')
@@ -158,6 +138,21 @@ function App() {
         }
         // Update statistics
         api.getStats().then(setStats).catch(console.error)
+      } else if (message.type === 'event_updated') {
+        // Color, make/model and plate arrive after the event itself
+        const event = message.payload as TrafficEvent
+        const upsert = (prev: TrafficEvent[]) => {
+          const index = prev.findIndex(e => e.id === event.id)
+          if (index === -1) return [event, ...prev].slice(0, 50)
+          const updated = [...prev]
+          updated[index] = event
+          return updated
+        }
+        if (event.side === 'left') {
+          setLeftEvents(upsert)
+        } else if (event.side === 'right') {
+          setRightEvents(upsert)
+        }
       }
     })
     return () => {
@@ -166,17 +161,6 @@ function App() {
     }
   }, [])
 
-  // Video stream update
-  useEffect(() => {
-    if (videoError) return
-
-    const videoInterval = setInterval(updateVideoStream, 100)
-    // First load
-    updateVideoStream()
-    
-    return () => clearInterval(videoInterval)
-  }, [updateVideoStream, videoError])
-
   // Always render UI, even if data is loading
   return (
     <div className={styles.app}>
@@ -191,7 +175,8 @@ function App() {
           />
         ) : (
           <img
-            ref={videoImgRef}
+            // MJPEG stream: the backend pushes each processed frame over one connection
+            src="/api/video-feed"
             className={styles.video}
             alt="Traffic stream with detections"
             style={{ objectFit: 'cover' }}
@@ -21,7 +21,7 @@ export interface Stats {
 }
 
 export interface WebSocketMessage {
-  type: 'event_created' | 'error'
+  type: 'event_created' | 'event_updated' | 'error'
   payload: any
 }
 